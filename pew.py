@@ -23,6 +23,48 @@
 #
 #---------------------------------------------------------------------------------------
 #
+# Version 1.3 - October 18th, 2026
+#  - Added iter_rows() and PewRowStream for incremental rowset parsing
+#  - PewRowStream records the document's currentTime / dataTime / cachedUntil
+#  - Added pew_export.py with CSV, SQLite and Parquet rowset export sinks
+#  - Added PewCache / PewFileCache, caching parsed results until cachedUntil
+#  - Added pack_result() / unpack_result() for compact binary result storage
+#  - Added per-instance stats counters (Pew.stats)
+#  - Added pew_bench.py with a re-parse vs. rehydrate benchmark
+#  - Added optional process pool parsing for responses over parse_threshold bytes
+#  - Added stream_parse mode, feeding response chunks to the parser as they arrive
+#  - Added gzip/deflate transfer compression, decoded while reading (PewResponse)
+#  - Added ecent_market_stat() for eve-central marketstat lookups
+#  - Added pew_market.py with batched, TTL-cached quotes and order book indexes
+#  - List parameters are now sent as repeated keys where an endpoint needs them
+#  - Added pew_maps.py, an indexed ring buffer of jumps / kills / sov / FW snapshots
+#  - Results now carry the response's _currentTime and _cachedUntil
+#  - Added pew_static.py, a versioned on-disk cache of skill / certificate / refType / error data
+#  - Added pew_mail.py, incremental mail / notification body sync with a local store
+#  - Request parameters are now per-thread, so one Pew object can be shared by threads
+#  - Added hydrate_contracts(), fetching contract items concurrently and caching them
+#  - Added load_planets() and PewPlanetGraph, loading every colony's pins / links / routes at once
+#  - API error documents sent with an HTTP error status now raise PewApiError
+#  - Added pew_keys.py, a pool of API keys with access-mask routing and quarantine
+#  - API errors are cached by URL until their cachedUntil (or a per-class TTL), unless cache_errors is off
+#  - Added PewApiError.retryable and error_codes() to tell retryable from permanent errors
+#  - Added PewErrorBudget, slowing requests down as the process nears the API's error limit
+#  - Endpoint methods are now generated from a declarative registry (ENDPOINTS)
+#     - fixed corp_pos_detail(), which passed an extra argument to the request
+#     - eve_character_id() now comma-joins name lists like the other list params
+#     - optional params left as None are no longer sent as 'None'
+#  - URL prefixes are built once per endpoint and reused
+#  - Added request hedging for latency-critical endpoints and per-call deadlines (call())
+#  - char_kill_log() and corp_kill_log() take an optional before_kill_id for paging
+#  - Added pew_kills.py, a deduplicated kill stream paging kill logs backwards
+#  - Added pew_load.py, a load test harness with a simulated API
+#  - Added pew_wallet.py, columnar journal / transaction analytics with FIFO profit
+#  - Added memory_budget: responses are spooled (to disk past the budget) and parsed
+#    incrementally, freeing the ElementTree as objects are built; see memory_stats
+#  - urllib / urllib2, ElementTree, multiprocessing, msgpack, resource and other heavy
+#    modules are imported on first use, so short-lived workers start faster
+#  - Added a startup benchmark to pew_bench.py (python pew_bench.py startup)
+#
 # Version 1.2 - April 19th, 2016
 #  - Fixed/updated several broken unit tests
 #  - Built .eve_apis CSV key loading into unit tests, replaced static data where possible
@@ -50,7 +92,6 @@
 #
 # Todos:
 #  - Add character / corp / alliance image method
-#  - Add (optional?) caching to match timeouts in API doc (maybe in raw_request?)
 #  - Figure out a way to properly test the char_contracts_items function
 #  - Fix broken endpoints
 #     - Corporation Contracts
@@ -69,6 +110,7 @@
 #
 # Completed Todos:
 #
+#  - Add (optional?) caching to match timeouts in API doc [DONE 10/18/2026]
 #  - Fix problems indicated in newly-fixed unit test [DONE 4/19]
 #  - Add unit tests to handle newly added API methods [DONE 4/19]
 #  - Add and test any missing endpoints
@@ -86,10 +128,46 @@
 #
 #---------------------------------------------------------------------------------------
 
-from urllib import urlencode
-from urllib2 import urlopen, URLError
-import xml.etree.ElementTree as ET
-import re
+# urllib / urllib2, ElementTree, multiprocessing, hashlib, tempfile, Queue and calendar
+# are imported inside the functions that use them: a worker that makes one call
+# shouldn't pay for the thread pool or the file cache at import time.
+import os
+import time
+import marshal
+import zlib
+import threading
+from collections import deque
+
+_public_name = None # compiled on the first __repr__
+
+_URL_SAFE = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-')
+
+def _quote(value):
+
+	if isinstance(value, unicode):
+		value = value.encode('utf-8')
+
+	return ''.join(c if c in _URL_SAFE else ('+' if c == ' ' else '%%%02X' % ord(c)) for c in str(value))
+
+def _urlencode(params):
+	"""urllib.urlencode(params, True), without importing urllib for requests answered from the cache"""
+
+	pairs = []
+
+	for key, value in params.items():
+		if isinstance(value, (list, tuple)):
+			pairs.extend('%s=%s' % (_quote(key), _quote(item)) for item in value)
+		else:
+			pairs.append('%s=%s' % (_quote(key), _quote(value)))
+
+	return '&'.join(pairs)
+
+def urlopen(request):
+	"""urllib2.urlopen, imported on the first request"""
+
+	import urllib2
+
+	return urllib2.urlopen(request)
 
 class PewApiObject(object):
 	"""pew API object"""
@@ -98,7 +176,397 @@ class PewApiObject(object):
 		pass
 
 	def __repr__(self):
-		return 'PEW API Object: {}'.format([l for l in dir(self) if re.match('[^_][^_].*',l)])
+		global _public_name
+
+		if _public_name is None:
+			import re
+			_public_name = re.compile('[^_][^_].*')
+
+		return 'PEW API Object: {}'.format([l for l in dir(self) if _public_name.match(l)])
+
+def pack_result(obj):
+	"""Converts a parsed result into plain dicts / lists that marshal or msgpack can store"""
+
+	if isinstance(obj, PewApiObject):
+		return dict((attr, pack_result(value)) for attr, value in obj.__dict__.items())
+	if isinstance(obj, list):
+		return [pack_result(item) for item in obj]
+	return obj
+
+def unpack_result(data):
+	"""Rebuilds PewApiObjects from the output of pack_result()"""
+
+	if isinstance(data, dict):
+		obj = PewApiObject()
+		for attr, value in data.items():
+			setattr(obj, attr, unpack_result(value))
+		return obj
+	if isinstance(data, list):
+		return [unpack_result(item) for item in data]
+	return data
+
+def _pool_parse(xml):
+	"""Parses a response inside a parse pool worker, returning it in pack_result() form"""
+
+	return pack_result(Pew()._parse_xml(xml))
+
+def _msgpack():
+	"""The msgpack module, imported on first use (None where it isn't installed)"""
+
+	try:
+		import msgpack
+	except ImportError:
+		return None
+
+	return msgpack
+
+def _max_rss():
+	"""Peak resident memory of this process in KB (None where the resource module is missing)"""
+
+	try:
+		import resource
+	except ImportError:
+		return None # not on Windows; memory_stats then leave out max RSS
+
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _concurrent_map(func, items, threads):
+	"""Maps func over items on a short-lived thread pool, in order"""
+
+	if threads <= 1 or len(items) <= 1:
+		return [func(item) for item in items]
+
+	from multiprocessing.pool import ThreadPool
+
+	pool = ThreadPool(min(threads, len(items)))
+
+	try:
+		return pool.map(func, items)
+	finally:
+		pool.close()
+		pool.join()
+
+class PewCache(object):
+	"""in-memory pew cache - keeps results serialized until they expire"""
+
+	def __init__(self, serializer = None):
+
+		self.serializer = serializer or _msgpack() or marshal
+		self._entries = {}
+		self._prune_at = 1024 # entries; expired ones are swept out whenever the cache reaches this
+
+	def get(self, key):
+
+		entry = self.get_entry(key)
+
+		return entry[1] if entry is not None else None
+
+	def get_entry(self, key):
+		"""OUTPUT: (expires, value) for a live entry, expires as a local timestamp; None if missing or expired"""
+
+		entry = self._read(key)
+
+		if entry is None:
+			return None
+
+		expires, data = entry
+
+		if expires <= time.time():
+			self.delete(key)
+			return None
+
+		return expires, self.serializer.loads(data)
+
+	def set(self, key, value, ttl):
+
+		self._write(key, time.time() + ttl, self.serializer.dumps(value))
+
+	def delete(self, key):
+
+		self._entries.pop(key, None)
+
+	def _read(self, key):
+
+		return self._entries.get(key)
+
+	def _write(self, key, expires, data):
+
+		self._entries[key] = (expires, data)
+
+		# e.g. errors for one-off beforeKillID pages; sweeping when the size doubles keeps this cheap
+		if len(self._entries) >= self._prune_at:
+			self._prune()
+
+	def _prune(self):
+		"""Drops every expired entry; entries that are never read again would otherwise stay forever"""
+
+		now = time.time()
+
+		for key, (expires, data) in self._entries.items():
+			if expires <= now:
+				self._entries.pop(key, None)
+
+		self._prune_at = max(2 * len(self._entries), 1024)
+
+class PewFileCache(PewCache):
+	"""on-disk pew cache - one file per entry, shareable between processes"""
+
+	def __init__(self, path, serializer = None):
+		super(PewFileCache, self).__init__(serializer)
+
+		self.path = path
+
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+	def delete(self, key):
+
+		try:
+			os.remove(self._file(key))
+		except OSError:
+			pass
+
+	def _file(self, key):
+
+		import hashlib
+
+		return os.path.join(self.path, hashlib.sha1(key).hexdigest())
+
+	def _read(self, key):
+
+		try:
+			with open(self._file(key), 'rb') as f:
+				expires = float(f.readline())
+				return expires, f.read()
+		except (IOError, ValueError):
+			return None
+
+	def _write(self, key, expires, data):
+
+		import tempfile
+
+		# write then rename so readers in other processes never see a partial entry; each
+		# write gets its own temp file, so threads storing the same key can't collide
+		fd, temp = tempfile.mkstemp(prefix='.tmp', dir=self.path)
+
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				f.write('%r\n' % expires)
+				f.write(data)
+
+			os.rename(temp, self._file(key))
+		except (IOError, OSError):
+			# a cache entry that can't be stored isn't worth failing the API call for
+			try:
+				os.remove(temp)
+			except OSError:
+				pass
+
+class PewPlanetGraph(object):
+	"""pew planet graph - one colony's pins as nodes and links / routes as edges, indexed by pinID"""
+
+	def __init__(self, colony, pins, links, routes):
+
+		self.colony = colony
+		self.planet_id = colony.planetID
+		self.pins = {}
+		self.contents = {}
+		self.links = links
+		self.routes = routes
+		self._neighbours = {}
+		self._routes_from = {}
+		self._routes_to = {}
+
+		# a pin holding several commodities is listed once per commodity
+		for pin in pins:
+			self.pins.setdefault(pin.pinID, pin)
+			if getattr(pin, 'contentTypeID', 0):
+				self.contents.setdefault(pin.pinID, []).append((pin.contentTypeID, pin.contentQuantity))
+
+		for link in links:
+			self._neighbours.setdefault(link.sourcePinID, []).append(link.destinationPinID)
+			self._neighbours.setdefault(link.destinationPinID, []).append(link.sourcePinID)
+
+		for route in routes:
+			self._routes_from.setdefault(route.sourcePinID, []).append(route)
+			self._routes_to.setdefault(route.destinationPinID, []).append(route)
+
+	def __repr__(self):
+
+		return 'PEW Planet Graph: {} ({} pins, {} links, {} routes)'.format(self.planet_id, len(self.pins), len(self.links), len(self.routes))
+
+	def neighbours(self, pin_id):
+
+		return self._neighbours.get(pin_id, [])
+
+	def routes_from(self, pin_id):
+
+		return self._routes_from.get(pin_id, [])
+
+	def routes_to(self, pin_id):
+
+		return self._routes_to.get(pin_id, [])
+
+class PewResponse(object):
+	"""pew response - file-like wrapper that undoes gzip/deflate transfer encoding as it reads"""
+
+	def __init__(self, response, count = None):
+
+		self.response = response
+		self.encoding = (response.info().get('Content-Encoding') or '').strip().lower()
+		self._count = count or (lambda name, amount: None)
+		self._decoder = None
+		self._buffer = ''
+
+		if self.encoding == 'gzip':
+			self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+	def read(self, size = -1):
+
+		while size < 0 or len(self._buffer) < size:
+			chunk = self.response.read() if size < 0 else self.response.read(size)
+
+			if not chunk:
+				if self._decoder is not None:
+					self._buffer += self._decoder.flush()
+					self._decoder = None
+				break
+
+			self._count('bytes_received', len(chunk))
+			self._buffer += self._decode(chunk)
+
+		if size < 0:
+			data, self._buffer = self._buffer, ''
+		else:
+			data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+		self._count('bytes_uncompressed', len(data))
+
+		return data
+
+	def close(self):
+
+		self.response.close()
+
+	def _decode(self, chunk):
+
+		if self.encoding == 'deflate' and self._decoder is None:
+			# 'deflate' is sent both zlib-wrapped and raw in the wild; a zlib header gives it away
+			zlib_wrapped = ord(chunk[0]) & 0x0f == 8 and (ord(chunk[0]) * 256 + ord(chunk[1:2] or '\0')) % 31 == 0
+			self._decoder = zlib.decompressobj(zlib.MAX_WBITS if zlib_wrapped else -zlib.MAX_WBITS)
+
+		if self._decoder is None:
+			return chunk
+
+		return self._decoder.decompress(chunk)
+
+class PewErrorBudget(object):
+	"""pew error budget - counts API errors in a sliding window and slows requests as the limit nears"""
+
+	def __init__(self, limit = 300, window = 180, slowdown = 0.5, max_delay = 5.0):
+
+		self.limit = limit
+		self.window = window
+		self.slowdown = slowdown # fraction of the limit after which requests start being delayed
+		self.max_delay = max_delay
+		self._errors = deque()
+		self._lock = threading.Lock()
+
+	def record(self, now = None):
+
+		with self._lock:
+			self._errors.append(now or time.time())
+
+	def used(self, now = None):
+		"""Fraction of the budget spent in the current window"""
+
+		now = now or time.time()
+
+		with self._lock:
+			while len(self._errors) > 0 and self._errors[0] <= now - self.window:
+				self._errors.popleft()
+
+			return float(len(self._errors)) / self.limit
+
+	def delay(self, now = None):
+		"""Seconds the next request should wait"""
+
+		now = now or time.time()
+		used = self.used(now)
+
+		if used >= 1:
+			# out of budget: wait until the oldest error leaves the window
+			with self._lock:
+				oldest = self._errors[0] if len(self._errors) > 0 else now
+			return max(oldest + self.window - now, 0)
+
+		if used <= self.slowdown:
+			return 0.0
+
+		return self.max_delay * (used - self.slowdown) / (1 - self.slowdown)
+
+# shared by every Pew object unless one is given its own
+ERROR_BUDGET = PewErrorBudget()
+
+class PewRowStream(object):
+	"""pew rowset stream - yields one rowset's rows as dicts while the XML is parsed"""
+
+	def __init__(self, source, rowset = None, parse_value = None):
+
+		self.source = source
+		self.rowset = rowset
+		self.name = None
+		self.key = None
+		self.columns = None
+		self.currentTime = None # the document's times, filled in as the stream reaches them
+		self.dataTime = None
+		self.cachedUntil = None
+		self._parse_value = parse_value or (lambda value: value)
+
+	def close(self):
+
+		if hasattr(self.source, 'close'):
+			self.source.close()
+
+	def __iter__(self):
+
+		depth = 0
+		target = None
+		target_node = None
+		done = False
+
+		import xml.etree.ElementTree as ET
+
+		for event, node in ET.iterparse(self.source, events=('start', 'end')):
+
+			if event == 'start':
+				if node.tag == 'rowset' and target is None and (self.rowset is None or node.get('name') == self.rowset):
+					target = depth
+					target_node = node
+					self.name = node.get('name')
+					self.key = node.get('key')
+					if node.get('columns'):
+						self.columns = node.get('columns').split(',')
+				depth += 1
+				continue
+
+			depth -= 1
+
+			if done:
+				# past the rowset only the times are wanted, cachedUntil comes last
+				if node.tag in ('dataTime', 'cachedUntil'):
+					setattr(self, node.tag, node.text)
+				node.clear()
+			elif target is not None and node.tag == 'row' and depth == target + 1:
+				yield dict((attr, self._parse_value(value)) for attr, value in node.items())
+				# rows are dropped once yielded so memory stays bounded by a single row
+				target_node.remove(node)
+			elif target is not None and node is target_node:
+				done = True
+			elif node.tag in ('currentTime', 'dataTime', 'cachedUntil'):
+				setattr(self, node.tag, node.text)
+			elif node.tag == 'error':
+				raise PewApiError(int(node.get('code')), node.text)
 
 class PewError(Exception):
 
@@ -110,12 +578,26 @@ class PewError(Exception):
 	def __str__(self):
 		return repr(self.error)
 
+# "retry after ..." errors from endpoints that ration how often they can be called
+RETRY_CODES = frozenset([101, 103, 115, 116, 117, 119])
+RETRY_PHRASES = ('retry after', 'try again', 'temporarily')
+
+def is_retryable(code, text = None):
+	"""True for API errors worth retrying later: ones whose text says so, the rationed 1xx
+	codes, and otherwise 5xx server and 9xx availability errors"""
+
+	if isinstance(text, basestring) and any(phrase in text.lower() for phrase in RETRY_PHRASES):
+		return True
+
+	return code in RETRY_CODES or code // 100 in (5, 9)
+
 class PewApiError(PewError):
 
 	def __init__(self, code, error):
 		super(PewApiError, self).__init__(error)
 
 		self.code = code
+		self.retryable = is_retryable(code, error)
 
 	def __str__(self):
 		return repr(self)
@@ -128,17 +610,99 @@ class PewConnectionError(PewError):
 	def __init__(self, error):
 		super(PewConnectionError, self).__init__(error)
 
+class PewParam(object):
+	"""pew endpoint parameter - a method argument and the API parameter it is sent as"""
+
+	def __init__(self, name, api_name, required = True, default = None, join = True):
+
+		self.name = name
+		self.api_name = api_name
+		self.required = required
+		self.default = default
+		self.join = join # list values are sent comma separated
+
+	def __repr__(self):
+
+		return 'PEW Param: {} -> {}'.format(self.name, self.api_name)
+
+class PewEndpoint(object):
+	"""pew endpoint - declarative description of one API call, used to generate its Pew method"""
+
+	def __init__(self, name, api_type, method_name, key = None, access_mask = 0, params = None, cache = True, hedge = False, doc = None):
+
+		self.name = name
+		self.api_type = api_type
+		self.method_name = method_name
+		self.key = key # None (public), 'account', 'character', 'corporation' or 'emd'
+		self.access_mask = access_mask
+		self.params = params or []
+		self.cache = cache # False for endpoints whose responses should never be cached
+		self.hedge = hedge # latency-critical, a slow request gets a duplicate when Pew.hedging is on
+		self.doc = doc
+		self._names = (['character_id'] if key in ('character', 'corporation') else []) + [param.name for param in self.params]
+		self._required = [name for name in self._names if name == 'character_id'] + [param.name for param in self.params if param.required]
+
+	def __repr__(self):
+
+		return 'PEW Endpoint: {} ({}/{})'.format(self.name, self.api_type, self.method_name)
+
+	def arg_names(self):
+
+		return list(self._names)
+
+	def bind(self, args, kwargs):
+		"""Matches call arguments to params like a normal method signature
+		OUTPUT: characterID (or None), list of (API parameter name, value) for params that have a value"""
+
+		names = self._names
+
+		if len(args) > len(names):
+			raise TypeError('%s() takes at most %d arguments (%d given)' % (self.name, len(names), len(args)))
+
+		values = dict(zip(names, args))
+
+		for name, value in kwargs.items():
+			if name not in names:
+				raise TypeError('%s() got an unexpected keyword argument \'%s\'' % (self.name, name))
+			if name in values:
+				raise TypeError('%s() got multiple values for keyword argument \'%s\'' % (self.name, name))
+			values[name] = value
+
+		missing = [name for name in self._required if name not in values]
+
+		if len(missing) > 0:
+			raise TypeError('%s() is missing arguments: %s' % (self.name, ', '.join(missing)))
+
+		bound = []
+
+		for param in self.params:
+			value = values.get(param.name, param.default)
+
+			if value is not None:
+				bound.append((param.api_name, _join(value) if param.join else value))
+
+		return values.get('character_id'), bound
+
+	def docstring(self):
+
+		if self.doc is not None:
+			return self.doc
+
+		return '%s/%s\n\t\tINPUT: %s' % (self.api_type, self.method_name, ', '.join(self.arg_names()) or 'none')
+
+def _join(lst):
+
+	if type(lst) is list:
+		return ','.join([str(i) for i in lst])
+	else:
+		return str(lst) # we want to return original in string form if its not a list
+
 class Pew(object):
 	"""pew object"""
 
-	_API_TYPE = 'api'
-	_CORP_TYPE = 'corp'
-	_CHAR_TYPE = 'char'
-	_ACCT_TYPE = 'account'
-	_MAPS_TYPE = 'map'
-	_EVE_TYPE = 'eve'
+	_url_prefixes = {} # (base url, api_type, method_name) -> url, shared by every Pew object
 
-	def __init__(self, api_id = None, api_key = None, api_nickname = None):
+	def __init__(self, api_id = None, api_key = None, api_nickname = None, cache = None, parse_pool = None, parse_threshold = 1048576, stream_parse = False):
 
 		self.api_id = api_id
 		self.api_key = api_key
@@ -147,64 +711,367 @@ class Pew(object):
 		self.emd_url = 'http://eve-marketdata.com/api'
 		self.emd_charname = 'demo' # maybe dynamically get this in the future?
 		self.ecent_url = 'http://api.eve-central.com/api'
-		self._params = {}
+		self.cache = cache
+		self.parse_pool = parse_pool # a multiprocessing.Pool, can be shared by many Pew objects
+		self.parse_threshold = parse_threshold
+		self.stream_parse = stream_parse
+		self.chunk_size = 65536
+		self.compression = True
+		self.contract_items_ttl = 30 * 86400
+		self.error_budget = ERROR_BUDGET
+		self.error_ttls = {1: 3600, 2: 3600, 5: 60, 9: 300} # error code // 100 -> seconds, when cachedUntil is missing
+		self.cache_errors = True # False sends every call to the API, even ones that just failed
+		self.stats = {}
+		self._stats_lock = threading.Lock()
+		self._local = threading.local()
+		self._contract_items = PewCache() # used by hydrate_contracts() when there's no cache
+		self._planet_graphs = {}
+		self._errors = PewCache() # negative cache, used when there's no cache
+		self.hedging = False # duplicate slow requests to endpoints flagged with hedge=True
+		self.hedge_percentile = 95 # a duplicate goes out once a request is slower than this percentile...
+		self.hedge_after = 1.0 # ...or this many seconds, until hedge_samples latencies have been seen
+		self.hedge_samples = 20
+		self._latencies = {} # (api_type, method_name) -> recent latencies of hedged endpoints
+		self.memory_budget = None # bytes; when set, responses are spooled and parsed incrementally
+		self.spool_dir = None # where responses over memory_budget are spooled, default is the temp dir
+		self.memory_stats = deque(maxlen=100) # one dict per spooled call, newest last
 
 	def __repr__(self):
 
 		return 'PEW Nickname: {}'.format(self.api_nickname)
 
+	# Per-thread request state, so concurrent calls can't mix up each other's parameters.
+
+	@property
+	def _params(self):
+
+		if not hasattr(self._local, 'params'):
+			self._local.params = {}
+
+		return self._local.params
+
+	@_params.setter
+	def _params(self, params):
+
+		self._local.params = params
+
+	@property
+	def _stream_rowset(self):
+
+		return getattr(self._local, 'stream_rowset', None)
+
+	@_stream_rowset.setter
+	def _stream_rowset(self, rowset):
+
+		self._local.stream_rowset = rowset
+
+	@property
+	def _call_options(self):
+
+		return getattr(self._local, 'call_options', None) or {}
+
+	@_call_options.setter
+	def _call_options(self, options):
+
+		self._local.call_options = options
+
 	# Request methods.
 
-	def _char_request(self, api_type, method_name, character_id):
+	def _endpoint_request(self, endpoint, args, kwargs):
+
+		character_id, params = endpoint.bind(args, kwargs)
+
+		for param_name, value in params:
+			self._params[param_name] = value
+
+		options = self._call_options
+
+		if endpoint.hedge and self.hedging and 'hedge' not in options:
+			self._call_options = dict(options, hedge=True)
+
+		try:
+			return self._dispatch(endpoint, character_id)
+		finally:
+			self._call_options = options
+
+	def _dispatch(self, endpoint, character_id):
+
+		if endpoint.key == 'emd':
+			return self._emd_request(endpoint.api_type, endpoint.method_name, endpoint.cache)
+		if endpoint.key in ('character', 'corporation'):
+			return self._char_request(endpoint.api_type, endpoint.method_name, character_id, endpoint.cache)
+		if endpoint.key == 'account':
+			return self._auth_request(endpoint.api_type, endpoint.method_name, endpoint.cache)
+
+		return self._request(endpoint.api_type, endpoint.method_name, endpoint.cache)
+
+	def _char_request(self, api_type, method_name, character_id, cache = True):
 
 		self._params['characterId'] = character_id
 
-		return self._auth_request(api_type, method_name)
+		return self._auth_request(api_type, method_name, cache)
 
-	def _auth_request(self, api_type, method_name):
+	def _auth_request(self, api_type, method_name, cache = True):
 
 		self._params['keyId'] = self.api_id
 		self._params['vCode'] = self.api_key
 
-		return self._request(api_type, method_name)
+		return self._request(api_type, method_name, cache)
 
-	def _emd_request(self, api_type, method_name):
+	def _emd_request(self, api_type, method_name, cache = True):
 
 		self._params['char_name'] = self.emd_charname
 
-		return self._request(api_type, method_name)
+		return self._request(api_type, method_name, cache)
 
-	def _request(self, api_type, method_name):
+	def _request(self, api_type, method_name, cache = True):
 
 		url = self._build_url(api_type, method_name)
 		self._params.clear()
 
-		result = self._raw_request(url)
+		if self._stream_rowset is not None:
+			return PewRowStream(self._open(url), self._stream_rowset or None, self._parse_value)
 
-		return self._handle_result(result)
+		cached = self._result_cache().get_entry(url) if cache else None
 
-	def _raw_request(self, url):
+		if cached is not None:
+			expires, root = cached[0], unpack_result(cached[1])
+
+			# errors are cached too, so bad keys and forbidden calls don't spend the error budget again
+			if hasattr(root, 'error'):
+				self._count('error_cache_hits')
+				raise PewApiError(int(root.error.code), root.error._value)
+
+			self._count('cache_hits')
+			return self._result(root, expires)
+
+		if self.cache is not None and cache:
+			self._count('cache_misses')
+
+		cache_url = url if cache else None # results of uncached endpoints aren't stored either
+
+		options = self._call_options
+
+		if self.memory_budget is not None:
+			return self._handle_parsed(self._fetch(self._spooled_request, url, (api_type, method_name), options), cache_url)
+
+		if self.stream_parse:
+			# parsing overlaps the download, so the process pool isn't used in this mode
+			return self._handle_parsed(self._fetch(self._stream_request, url, (api_type, method_name), options), cache_url)
+
+		result = self._fetch(self._raw_request, url, (api_type, method_name), options)
+
+		return self._handle_result(result, cache_url)
+
+	def _fetch(self, fetch, url, latency_key, options):
+		"""Runs fetch(url), racing a duplicate against it when hedging and giving up at a deadline"""
+
+		hedge = options.get('hedge', False)
+		deadline = options.get('deadline')
+
+		if not hedge and deadline is None:
+			return fetch(url)
+
+		from Queue import Queue, Empty
+
+		start = time.time()
+		results = Queue()
+
+		def attempt(n):
+			began = time.time()
+			try:
+				results.put((n, True, fetch(url), time.time() - began))
+			except Exception as er:
+				results.put((n, False, er, time.time() - began))
+
+		def launch(n):
+			thread = threading.Thread(target=attempt, args=(n,))
+			thread.daemon = True # a losing attempt is left to finish on its own and ignored
+			thread.start()
+
+		launch(0)
+		pending = 1
+		hedge_at = start + self._hedge_delay(latency_key) if hedge else None
+		give_up_at = start + deadline if deadline is not None else None
+
+		while True:
+			wake_at = min([t for t in (hedge_at, give_up_at) if t is not None] or [None])
+
+			try:
+				if wake_at is None:
+					n, ok, value, elapsed = results.get()
+				else:
+					n, ok, value, elapsed = results.get(True, max(wake_at - time.time(), 0))
+			except Empty:
+				if hedge_at is not None and time.time() >= hedge_at:
+					self._count('hedges_fired')
+					launch(1)
+					pending += 1
+					hedge_at = None
+					continue
+
+				if give_up_at is not None and time.time() >= give_up_at:
+					self._count('deadlines_exceeded')
+					raise PewConnectionError('no response within %.3fs deadline: %s' % (deadline, url))
+
+				continue
+
+			pending -= 1
+
+			if ok:
+				if n == 1:
+					self._count('hedges_won')
+				if hedge:
+					self._record_latency(latency_key, elapsed)
+				return value
+
+			# one failure isn't final while the other attempt is still out
+			if pending == 0:
+				raise value
+
+	def _hedge_delay(self, latency_key):
+
+		with self._stats_lock:
+			latencies = sorted(self._latencies.get(latency_key, []))
+
+		if len(latencies) < self.hedge_samples:
+			return self.hedge_after
+
+		return latencies[min(int(len(latencies) * self.hedge_percentile / 100.0), len(latencies) - 1)]
+
+	def _record_latency(self, latency_key, elapsed):
+
+		with self._stats_lock:
+			if latency_key not in self._latencies:
+				self._latencies[latency_key] = deque(maxlen=200)
+
+			self._latencies[latency_key].append(elapsed)
+
+	def _open(self, url):
+
+		headers = {'Accept-Encoding': 'gzip, deflate'} if self.compression else {}
+
+		if self.error_budget is not None:
+			delay = self.error_budget.delay()
+
+			if delay > 0:
+				self._count('error_budget_delays')
+				self._count('error_budget_seconds', delay)
+				time.sleep(delay)
+
+		from urllib2 import Request, URLError, HTTPError
 
 		try:
-			response = urlopen(url)
-			result = response.read()
+			return PewResponse(urlopen(Request(url, headers=headers)), self._count)
 
-			return result
+		except HTTPError as er:
+			# auth and permission failures come back as a 403 etc. with a normal error document
+			if 'xml' in (er.info().get('Content-Type') or ''):
+				return PewResponse(er, self._count)
+			raise PewConnectionError(str('url: ' + str(url) + ' || error: ' + str(er)))
 
 		except URLError as er:
 			raise PewConnectionError(str('url: ' + str(url) + ' || error: ' + str(er)))
 
+	def _raw_request(self, url):
+
+		return self._open(url).read()
+
+	def _stream_request(self, url):
+
+		import xml.etree.ElementTree as ET
+
+		response = self._open(url)
+		parser = ET.XMLParser()
+
+		while True:
+			chunk = response.read(self.chunk_size)
+
+			if not chunk:
+				break
+
+			parser.feed(chunk)
+
+		return self._r_parse_xml(parser.close())[0]
+
+	def _spooled_request(self, url):
+		"""Downloads into a spool that moves to disk past memory_budget, then parses it incrementally"""
+
+		import tempfile
+
+		start = time.time()
+		max_rss = _max_rss()
+		response = self._open(url)
+		spool = tempfile.SpooledTemporaryFile(max_size=self.memory_budget, dir=self.spool_dir)
+		size = 0
+
+		try:
+			while True:
+				chunk = response.read(self.chunk_size)
+
+				if not chunk:
+					break
+
+				spool.write(chunk)
+				size += len(chunk)
+
+			del chunk
+
+			if size > self.memory_budget:
+				self._count('spooled_responses')
+				self._count('spooled_bytes', size)
+
+			spool.seek(0)
+			result = self._iterparse_xml(spool)
+		finally:
+			spool.close()
+
+		peak = _max_rss()
+		self.memory_stats.append({
+			'url': url,
+			'bytes': size,
+			'spooled': size > self.memory_budget,
+			'seconds': time.time() - start,
+			'max_rss_kb': peak,
+			# ru_maxrss is the process' high-water mark, so this is how far the call raised it: 0 when
+			# the call stayed under an earlier peak, and shared with anything running beside it
+			'new_peak_kb': peak - max_rss if peak is not None else None,
+		})
+
+		return result
+
+	def _ecent_request(self, method_name):
+
+		import xml.etree.ElementTree as ET
+
+		url = self._build_url('ecent', method_name)
+		self._params.clear()
+
+		return ET.fromstring(self._raw_request(url))
+
 	def _build_url(self, api_type, method_name):
 
 		if api_type == 'emd':
-			url = '%s/%s.xml' % (self.emd_url , method_name)
+			key = (self.emd_url, api_type, method_name)
 		elif api_type == 'ecent':
-			url = '%s/%s' % (self.ecent_url , method_name)
+			key = (self.ecent_url, api_type, method_name)
 		else:
-			url = '%s/%s/%s.xml.aspx' % (self.api_url, api_type, method_name)
+			key = (self.api_url, api_type, method_name)
+
+		url = self._url_prefixes.get(key)
+
+		if url is None:
+			if api_type == 'emd':
+				url = '%s/%s.xml' % (self.emd_url , method_name)
+			elif api_type == 'ecent':
+				url = '%s/%s' % (self.ecent_url , method_name)
+			else:
+				url = '%s/%s/%s.xml.aspx' % (self.api_url, api_type, method_name)
+
+			self._url_prefixes[key] = url
 
 		if len(self._params) > 0:
-			url = '%s?%s' % (url, urlencode(self._params))
+			url = '%s?%s' % (url, _urlencode(self._params))
 
 		return url
 
@@ -212,26 +1079,58 @@ class Pew(object):
 
 	def _parse_xml(self, xml):
 
+		import xml.etree.ElementTree as ET
+
 		tree = ET.fromstring(xml)
 
 		return self._r_parse_xml(tree)[0]
 
 	def _r_parse_xml(self, node):
 
+		return self._build_node(node, [self._r_parse_xml(child) for child in node])
+
+	def _iterparse_xml(self, source):
+		"""Parses a file-like object, turning each element into objects as it closes and then dropping it"""
+
+		import xml.etree.ElementTree as ET
+
+		elements = []
+		children = [[]]
+
+		for event, node in ET.iterparse(source, ('start', 'end')):
+			if event == 'start':
+				elements.append(node)
+				children.append([])
+				continue
+
+			elements.pop()
+			built = self._build_node(node, children.pop())
+			children[-1].append(built)
+
+			# every earlier sibling is already built, so the parent only keeps what it still needs
+			if len(elements) > 0:
+				del elements[-1][:]
+
+			node.clear()
+
+		return children[0][0][0]
+
+	def _build_node(self, node, children):
+		"""One element as a value, given its children already built as (value, tag) pairs"""
+
 		has_value = node.text is not None and len(node.text.strip()) > 0
 
 		if node.tag == 'rowset':
-			return [self._r_parse_xml(child)[0] for child in node], node.get('name')
+			return [child_obj for child_obj, child_tag in children], node.get('name')
 
-		if len(node) > 0 or len(node.items()) > 0:
+		if len(children) > 0 or len(node.items()) > 0:
 
 			obj = PewApiObject()
 
 			for attr, value in node.items():
 				setattr(obj, attr, self._parse_value(value))
 
-			for child in node:
-				child_obj, child_tag = self._r_parse_xml(child)
+			for child_obj, child_tag in children:
 				setattr(obj, child_tag, child_obj)
 
 			if has_value:
@@ -250,316 +1149,369 @@ class Pew(object):
 		except ValueError:
 			return value
 
-	def _handle_result(self, xml):
+	def _handle_result(self, xml, url = None):
 
-		result = self._parse_xml(xml)
+		packed = None
 
-		if hasattr(result, 'error'):
-			raise PewApiError(int(result.error.code), result.error._value)
+		if self.parse_pool is not None and len(xml) >= self.parse_threshold:
+			# big documents are parsed on another core; this thread just waits without the GIL
+			packed = self.parse_pool.apply(_pool_parse, (xml,))
+			result = unpack_result(packed)
+			self._count('pool_parses')
+		else:
+			result = self._parse_xml(xml)
 
-		return result.result
+		return self._handle_parsed(result, url, packed)
 
-	# Misc. methods.
-
-	def _join(self, lst):
+	def _handle_parsed(self, result, url = None, packed = None):
 
-		if type(lst) is list:
-			return ','.join([str(i) for i in lst])
-		else:
-			return str(lst) # we want to return original in string form if its not a list
+		if hasattr(result, 'error'):
+			error = PewApiError(int(result.error.code), result.error._value)
 
-	# eve-marketdata.com API methods -- EXPERIMENTAL
+			self._count('api_errors')
 
-	def emd_item_prices(self, buysell, type_ids, marketgroup_ids = None, region_ids = None, solarsystem_ids = None, station_ids = None):
-		"""Eve-Marketdata item prices
-		INPUT: buysell flag (b = buy/s = sell/a = all), type_ids, marketgroup_ids, region_ids, solarsystem_ids, station_ids"""
-		self._params['buysell'] = buysell
-		self._params['type_ids'] = self._join(type_ids)
-		if marketgroup_ids is not None:
-			self._params['marketgroup_ids'] = self._join(marketgroup_ids)
-		if region_ids is not None:
-			self._params['region_ids'] = self._join(region_ids)
-		if solarsystem_ids is not None:
-			self._params['solarsystem_ids'] = self._join(solarsystem_ids)
-		if station_ids is not None:
-			self._params['station_ids'] = self._join(station_ids)
-		return self._emd_request('emd', 'item_prices2')
-
-	# usage: emd = emd_item_orders('b' os 's' or 'a', region_ids list or None, solarsystem_ids or None, station_ids or None)
-	def emd_item_orders(self, buysell, minmax, type_ids, marketgroup_ids = None, region_ids = None, solarsystem_ids = None, station_ids = None):
-		"""Eve-Marketdata item prices
-		INPUT: buysell flag (b = buy/s = sell/a = all), type_ids, marketgroup_ids, region_ids, solarsystem_ids, station_ids"""
-		self._params['buysell'] = buysell
-		self._params['minmax'] = minmax
-		self._params['type_ids'] = self._join(type_ids)
-		if marketgroup_ids is not None:
-			self._params['marketgroup_ids'] = self._join(marketgroup_ids)
-		if region_ids is not None:
-			self._params['region_ids'] = self._join(region_ids)
-		if solarsystem_ids is not None:
-			self._params['solarsystem_ids'] = self._join(solarsystem_ids)
-		if station_ids is not None:
-			self._params['station_ids'] = self._join(station_ids)
-		return self._emd_request('emd', 'item_orders2')
+			if self.error_budget is not None:
+				self.error_budget.record()
 
-	# Account API methods.
+			if url is not None and self.cache_errors:
+				ttl = self._cache_ttl(result) or self.error_ttls.get(error.code // 100, 0)
 
-	def acct_characters(self):
-		return self._auth_request(self._ACCT_TYPE, 'characters')
+				if ttl > 0:
+					self._result_cache().set(url, packed or pack_result(result), ttl)
 
-	def acct_status(self):
-		return self._auth_request(self._ACCT_TYPE, 'accountStatus')
+			raise error
 
-	def acct_api_key_info(self):
-		return self._auth_request(self._ACCT_TYPE, 'APIKeyInfo')
+		if url is not None and self.cache is not None:
+			ttl = self._cache_ttl(result)
 
-	# Character API Methods
+			if ttl > 0:
+				self.cache.set(url, packed or pack_result(result), ttl)
 
-	def char_account_balance(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'AccountBalance', character_id)
+		return self._result(result)
 
-	def char_asset_list(self, character_id, flat=0):
-		self._params['flat'] = self._join(flat)
-		return self._char_request(self._CHAR_TYPE,'assetList', character_id)
+	def _result_cache(self):
 
-	def char_calendar_event_attendees(self, character_id, event_ids):
-		self._params['eventIds'] = self._join(event_ids)
-		return self._char_request(self._CHAR_TYPE,'calendarEventAttendees', character_id)
+		return self.cache if self.cache is not None else self._errors
 
-	def char_character_sheet(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'characterSheet', character_id)
+	def _result(self, root, expires = None):
 
-	def char_contact_list(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'contactList', character_id)
+		result = root.result
 
-	def char_contact_notifications(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'contactNotifications', character_id)
+		# hidden from __repr__ like _value, but lets callers see how fresh a result is
+		if isinstance(result, PewApiObject):
+			result._currentTime = getattr(root, 'currentTime', None)
+			result._cachedUntil = getattr(root, 'cachedUntil', None)
 
-	def char_contracts(self, character_id, contract_id = None):
-		self._params['contractID'] = self._join(contract_id)
-		return self._char_request(self._CHAR_TYPE,'contracts', character_id)
+			# a cache hit: the document's own times are as old as the entry, so remember when the entry runs out
+			if expires is not None:
+				result._expires = expires
 
-	def char_contract_bids(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'contractBids', character_id)
+		return result
 
-	def char_contract_items(self, character_id, contract_id):
-		self._params['contractID'] = self._join(contract_id)
-		return self._char_request(self._CHAR_TYPE,'contractItems', character_id)
+	def _cache_ttl(self, result):
 
-	def char_factional_warfare_statistics(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'facWarStats', character_id)
+		# measured against the server's own clock so local clock skew doesn't matter
+		try:
+			return self._parse_time(result.cachedUntil) - self._parse_time(result.currentTime)
+		except (AttributeError, TypeError, ValueError):
+			return 0
 
-	def char_industry_jobs(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'industryJobs', character_id)
+	def _parse_time(self, value):
 
-	def char_industry_job_history(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'industryJobHistory', character_id)
+		import calendar
 
-	def char_kill_log(self, character_id):
-		return self._char_request(self._CHAR_TYPE,'killLog', character_id)
+		return calendar.timegm(time.strptime(value, '%Y-%m-%d %H:%M:%S'))
 
-	def char_mailing_lists(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'mailinglists', character_id)
+	# Result helpers.
 
-	def char_mail_bodies(self, character_id, mail_ids):
-		self._params['ids'] = self._join(mail_ids)
-		return self._char_request(self._CHAR_TYPE, 'mailbodies', character_id)
+	def result_ttl(self, result):
+		"""Seconds a result returned by an API method stays valid, measured on the server's clock (0 if unknown).
+		Results served from the cache report the time left on their cache entry instead."""
 
-	def char_mail_messages(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'mailmessages', character_id)
+		if getattr(result, '_expires', None) is not None:
+			return max(result._expires - time.time(), 0)
 
-	def char_market_orders(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'marketorders', character_id)
+		try:
+			return self._parse_time(result._cachedUntil) - self._parse_time(result._currentTime)
+		except (AttributeError, TypeError, ValueError):
+			return 0
 
-	def char_medals(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'medals', character_id)
+	def error_codes(self):
+		"""Every API error code from eve_error_list
+		OUTPUT: dict of code -> (text, retryable)"""
 
-	def char_notification_texts(self, character_id, notification_ids):
-		self._params['ids'] = self._join(notification_ids)
-		return self._char_request(self._CHAR_TYPE, 'notificationtexts', character_id)
+		return dict((row.errorCode, (row.errorText, is_retryable(row.errorCode, row.errorText))) for row in self.eve_error_list().errors)
 
-	def char_notifications(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'notifications', character_id)
+	# Streaming methods.
 
-	def char_npc_standings(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'standings', character_id)
+	def iter_rows(self, endpoint, *args, **kwargs):
+		"""Streams the rows of an endpoint's rowset without building PewApiObjects
+		INPUT: endpoint method name (e.g. 'char_wallet_journal'), its arguments, optional rowset name
+		OUTPUT: PewRowStream yielding one dict per row"""
 
-	def char_planetary_colonies(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'planetaryColonies', character_id)
+		self._stream_rowset = kwargs.pop('rowset', None) or ''
 
-	def char_planetary_links(self, character_id, planet_id):
-		self._params['planetID'] = planet_id
-		return self._char_request(self._CHAR_TYPE, 'planetaryLinks', character_id)
+		try:
+			return getattr(self, endpoint)(*args, **kwargs)
+		finally:
+			self._stream_rowset = None
 
-	def char_planetary_pins(self, character_id, planet_id):
-		self._params['planetID'] = planet_id
-		return self._char_request(self._CHAR_TYPE, 'planetaryPins', character_id)
+	def call(self, endpoint, *args, **kwargs):
+		"""Calls an endpoint with per-call latency options
+		INPUT: endpoint method name, its arguments, optional deadline (seconds) and hedge (True / False, default is the endpoint's setting)
+		OUTPUT: the endpoint's result, or PewConnectionError if the deadline passes first"""
 
-	def char_planetary_routes(self, character_id, planet_id):
-		self._params['planetID'] = planet_id
-		return self._char_request(self._CHAR_TYPE, 'PlanetaryRoutes', character_id)
+		previous = self._call_options
+		options = dict(previous)
 
-	def char_research(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'research', character_id)
+		for name in ('deadline', 'hedge'):
+			if name in kwargs:
+				options[name] = kwargs.pop(name)
 
-	def char_skill_in_training(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'skillintraining', character_id)
+		self._call_options = options
 
-	def char_skill_queue(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'skillqueue', character_id)
+		try:
+			return getattr(self, endpoint)(*args, **kwargs)
+		finally:
+			self._call_options = previous
 
-	def char_upcoming_calendar_events(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'upcomingcalendarevents', character_id)
+	# Misc. methods.
 
-	def char_wallet_journal(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'walletjournal', character_id)
+	def _count(self, name, amount = 1):
 
-	def char_wallet_transactions(self, character_id):
-		return self._char_request(self._CHAR_TYPE, 'wallettransactions', character_id)
+		with self._stats_lock:
+			self.stats[name] = self.stats.get(name, 0) + amount
 
-	# Corporation API methods.
+	def _join(self, lst):
 
-	def corp_account_balance(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'accountBalance', character_id)
+		return _join(lst)
 
-	def corp_asset_list(self, character_id):
-		return self._char_request(self._CORP_TYPE,'assetList', character_id)
+	# eve-central.com API methods -- EXPERIMENTAL
 
-	def corp_contact_list(self, character_id):
-		return self._char_request(self._CORP_TYPE,'contactList', character_id)
+	def ecent_market_stat(self, type_ids, region_ids = None, system_id = None, min_q = None):
+		"""Eve-Central market stats
+		INPUT: type_ids, region_ids (stats are combined across regions), system_id, min_q (minimum order quantity)
+		OUTPUT: list of types, each with id and buy/sell/all volume, avg, max, min, stddev, median, percentile"""
+		self._params['typeid'] = type_ids if type(type_ids) is list else [type_ids]
+		if region_ids is not None:
+			self._params['regionlimit'] = region_ids if type(region_ids) is list else [region_ids]
+		if system_id is not None:
+			self._params['usesystem'] = system_id
+		if min_q is not None:
+			self._params['minQ'] = min_q
+		# marketstat repeats <type> elements outside a rowset, so each one is parsed on its own
+		tree = self._ecent_request('marketstat')
+		return [self._r_parse_xml(node)[0] for node in tree.iter('type')]
 
-	def corp_container_log(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'containerlog', character_id)
+	# Composite API methods.
 
-	# these haven't been working properly - need to investigate later
-	#def corp_contracts(self, character_id, contract_id = None):
-	#	self._params['contractID'] = self._join(contract_id)
-	#	return self._char_request(self._CORP_TYPE,'contracts', character_id)
+	def hydrate_contracts(self, character_id, threads = 8):
+		"""Character contracts joined with their items and bids
+		INPUT: character_id, number of concurrent item lookups
+		OUTPUT: contractList rows, each with .items (None if the lookup failed) and .bids"""
 
-	#def corp_contract_bids(self, character_id):
-	#	return self._char_request(self._CORP_TYPE,'contractBids', character_id)
+		contracts = self.char_contracts(character_id).contractList
+		bids = {}
 
-	#def corp_contract_items(self, character_id, contract_id):
-	#	self._params['contractID'] = self._join(contract_id)
-	#	return self._char_request(self._CORP_TYPE,'contractItems', character_id)
+		# contractBids covers every contract of the character in one call
+		for bid in self.char_contract_bids(character_id).bidList:
+			bids.setdefault(bid.contractID, []).append(bid)
 
-	def corp_corporation_sheet(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'corporationsheet', character_id)
+		cache = self.cache if self.cache is not None else self._contract_items
+		items = {}
+		missing = []
 
-	def corp_factional_warfare_statistics(self, character_id):
-		return self._char_request(self._CORP_TYPE,'facWarStats', character_id)
+		for contract in contracts:
+			cached = cache.get('contractItems:%s' % contract.contractID)
 
-	def corp_industry_jobs(self, character_id):
-		return self._char_request(self._CORP_TYPE,'industryJobs', character_id)
+			if cached is not None:
+				items[contract.contractID] = unpack_result(cached)
+			else:
+				missing.append(contract.contractID)
 
-	def corp_kill_log(self, character_id):
-		return self._char_request(self._CORP_TYPE,'killLog', character_id)
+		self._count('contract_items_cached', len(contracts) - len(missing))
 
-	def corp_market_orders(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'marketorders', character_id)
+		def fetch(contract_id):
 
-	def corp_medals(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'medals', character_id)
+			try:
+				return self.char_contract_items(character_id, contract_id).itemList
+			except (PewApiError, PewConnectionError):
+				# one failed contract leaves its items at None rather than failing the lot
+				self._count('contract_item_errors')
+				return None
 
-	def corp_member_medals(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'membermedals', character_id)
+		for contract_id, contract_items in zip(missing, _concurrent_map(fetch, missing, threads)):
+			items[contract_id] = contract_items
 
-	def corp_member_security(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'membersecurity', character_id)
+			# a contract's items never change once it is created, so they can be kept for a long time
+			if contract_items is not None:
+				cache.set('contractItems:%s' % contract_id, pack_result(contract_items), self.contract_items_ttl)
 
-	def corp_member_security_log(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'membersecuritylog', character_id)
+		for contract in contracts:
+			contract.items = items.get(contract.contractID)
+			contract.bids = bids.get(contract.contractID, [])
 
-	def corp_member_tracking(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'membertracking', character_id)
+		return contracts
 
-	def corp_npc_standings(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'standings', character_id)
+	def load_planets(self, character_id, threads = 8):
+		"""Every planetary colony of a character as a graph, loaded with concurrent per-planet calls
+		INPUT: character_id, number of concurrent calls
+		OUTPUT: dict of planetID -> PewPlanetGraph, reused until the oldest underlying result expires"""
 
-	def corp_outpost_list(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'outpostlist', character_id)
+		cached = self._planet_graphs.get(character_id)
 
-	def corp_outpost_service_detail(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'outpostservicedetail', character_id)
+		if cached is not None and cached[0] > time.time():
+			return cached[1]
 
-	def corp_pos_detail(self, item_id):
-		self._params['itemID'] = item_id
-		return self._auth_request(self._CORP_TYPE, 'starbasedetail', item_id)
+		colonies = self.char_planetary_colonies(character_id)
+		calls = [(method, colony.planetID) for colony in colonies.colonies for method in (self.char_planetary_pins, self.char_planetary_links, self.char_planetary_routes)]
+		results = _concurrent_map(lambda call: call[0](character_id, call[1]), calls, threads)
+		graphs = {}
 
-	def corp_pos_list(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'starbaselist', character_id)
+		for i, colony in enumerate(colonies.colonies):
+			pins, links, routes = results[i * 3:i * 3 + 3]
+			graphs[colony.planetID] = PewPlanetGraph(colony, pins.pins, links.links, routes.routes)
 
-	def corp_shareholders(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'shareholders', character_id)
+		ttl = min([self.result_ttl(result) for result in [colonies] + results])
 
-	def corp_titles(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'titles', character_id)
+		if ttl > 0:
+			self._planet_graphs[character_id] = (time.time() + ttl, graphs)
 
-	def corp_wallet_journal(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'walletjournal', character_id)
+		return graphs
 
-	def corp_wallet_transactions(self, character_id):
-		return self._char_request(self._CORP_TYPE, 'wallettransactions', character_id)
+# Endpoint registry. Every entry becomes a Pew method of the same name; tools can walk
+# ENDPOINTS to enumerate calls, their parameters, key needs and cache policy.
 
-	# Eve API methods.
+ENDPOINTS = [
 
-	def eve_alliance_list(self):
-		return self._request(self._EVE_TYPE, 'alliancelist')
+	# eve-marketdata.com API methods -- EXPERIMENTAL
 
-	def eve_certificate_tree(self):
-		return self._request(self._EVE_TYPE, 'certificatetree')
+	PewEndpoint('emd_item_prices', 'emd', 'item_prices2', 'emd', cache=False, params=[
+		PewParam('buysell', 'buysell', join=False), PewParam('type_ids', 'type_ids'),
+		PewParam('marketgroup_ids', 'marketgroup_ids', False), PewParam('region_ids', 'region_ids', False),
+		PewParam('solarsystem_ids', 'solarsystem_ids', False), PewParam('station_ids', 'station_ids', False),
+	], doc="""Eve-Marketdata item prices
+		INPUT: buysell flag (b = buy/s = sell/a = all), type_ids, marketgroup_ids, region_ids, solarsystem_ids, station_ids"""),
 
-	def eve_character_id(self, character_names):
-		self._params['names'] = ''.join(character_names)
-		return self._request(self._EVE_TYPE, 'characterid')
+	PewEndpoint('emd_item_orders', 'emd', 'item_orders2', 'emd', cache=False, params=[
+		PewParam('buysell', 'buysell', join=False), PewParam('minmax', 'minmax', join=False), PewParam('type_ids', 'type_ids'),
+		PewParam('marketgroup_ids', 'marketgroup_ids', False), PewParam('region_ids', 'region_ids', False),
+		PewParam('solarsystem_ids', 'solarsystem_ids', False), PewParam('station_ids', 'station_ids', False),
+	], doc="""Eve-Marketdata item orders
+		INPUT: buysell flag (b = buy/s = sell/a = all), minmax, type_ids, marketgroup_ids, region_ids, solarsystem_ids, station_ids"""),
 
-	def eve_character_info(self, character_id):
-		return self._char_request(self._EVE_TYPE, 'characterinfo', character_id)
+	# Account API methods.
 
-	def eve_character_name(self, character_ids):
-		self._params['ids'] = self._join(character_ids)
-		return self._request(self._EVE_TYPE, 'charactername')
+	PewEndpoint('acct_characters', 'account', 'characters', 'account'),
+	PewEndpoint('acct_status', 'account', 'accountStatus', 'account', 33554432),
+	PewEndpoint('acct_api_key_info', 'account', 'APIKeyInfo', 'account'),
 
-	def eve_conquerable_station_list(self):
-		return self._request(self._EVE_TYPE, 'conquerablestationlist')
+	# Character API Methods
 
-	def eve_error_list(self):
-		return self._request(self._EVE_TYPE, 'errorlist')
+	PewEndpoint('char_account_balance', 'char', 'AccountBalance', 'character', 1),
+	PewEndpoint('char_asset_list', 'char', 'assetList', 'character', 2, [PewParam('flat', 'flat', False, 0)]),
+	PewEndpoint('char_calendar_event_attendees', 'char', 'calendarEventAttendees', 'character', 4, [PewParam('event_ids', 'eventIds')]),
+	PewEndpoint('char_character_sheet', 'char', 'characterSheet', 'character', 8),
+	PewEndpoint('char_contact_list', 'char', 'contactList', 'character', 16),
+	PewEndpoint('char_contact_notifications', 'char', 'contactNotifications', 'character', 32),
+	PewEndpoint('char_contracts', 'char', 'contracts', 'character', 67108864, [PewParam('contract_id', 'contractID', False)]),
+	PewEndpoint('char_contract_bids', 'char', 'contractBids', 'character', 67108864),
+	PewEndpoint('char_contract_items', 'char', 'contractItems', 'character', 67108864, [PewParam('contract_id', 'contractID')]),
+	PewEndpoint('char_factional_warfare_statistics', 'char', 'facWarStats', 'character', 64),
+	PewEndpoint('char_industry_jobs', 'char', 'industryJobs', 'character', 128),
+	PewEndpoint('char_industry_job_history', 'char', 'industryJobHistory', 'character', 128),
+	PewEndpoint('char_kill_log', 'char', 'killLog', 'character', 256, [PewParam('before_kill_id', 'beforeKillID', False, join=False)]),
+	PewEndpoint('char_mailing_lists', 'char', 'mailinglists', 'character', 1024),
+	PewEndpoint('char_mail_bodies', 'char', 'mailbodies', 'character', 512, [PewParam('mail_ids', 'ids')]),
+	PewEndpoint('char_mail_messages', 'char', 'mailmessages', 'character', 2048),
+	PewEndpoint('char_market_orders', 'char', 'marketorders', 'character', 4096),
+	PewEndpoint('char_medals', 'char', 'medals', 'character', 8192),
+	PewEndpoint('char_notification_texts', 'char', 'notificationtexts', 'character', 32768, [PewParam('notification_ids', 'ids')]),
+	PewEndpoint('char_notifications', 'char', 'notifications', 'character', 16384),
+	PewEndpoint('char_npc_standings', 'char', 'standings', 'character', 524288),
+	PewEndpoint('char_planetary_colonies', 'char', 'planetaryColonies', 'character', 2),
+	PewEndpoint('char_planetary_links', 'char', 'planetaryLinks', 'character', 2, [PewParam('planet_id', 'planetID', join=False)]),
+	PewEndpoint('char_planetary_pins', 'char', 'planetaryPins', 'character', 2, [PewParam('planet_id', 'planetID', join=False)]),
+	PewEndpoint('char_planetary_routes', 'char', 'PlanetaryRoutes', 'character', 2, [PewParam('planet_id', 'planetID', join=False)]),
+	PewEndpoint('char_research', 'char', 'research', 'character', 65536),
+	PewEndpoint('char_skill_in_training', 'char', 'skillintraining', 'character', 131072, hedge=True),
+	PewEndpoint('char_skill_queue', 'char', 'skillqueue', 'character', 262144),
+	PewEndpoint('char_upcoming_calendar_events', 'char', 'upcomingcalendarevents', 'character', 1048576),
+	PewEndpoint('char_wallet_journal', 'char', 'walletjournal', 'character', 2097152),
+	PewEndpoint('char_wallet_transactions', 'char', 'wallettransactions', 'character', 4194304),
 
-	def eve_factional_warfare_statistics(self):
-		return self._request(self._EVE_TYPE, 'facwarstats')
+	# Corporation API methods.
 
-	def eve_factional_warfare_top_statistics(self):
-		return self._request(self._EVE_TYPE, 'facwartopstats')
+	PewEndpoint('corp_account_balance', 'corp', 'accountBalance', 'corporation', 1),
+	PewEndpoint('corp_asset_list', 'corp', 'assetList', 'corporation', 2),
+	PewEndpoint('corp_contact_list', 'corp', 'contactList', 'corporation', 16),
+	PewEndpoint('corp_container_log', 'corp', 'containerlog', 'corporation', 32),
 
-	def eve_reference_types(self):
-		return self._request(self._EVE_TYPE, 'reftypes')
+	# these haven't been working properly - need to investigate later
+	#PewEndpoint('corp_contracts', 'corp', 'contracts', 'corporation', 8388608, [PewParam('contract_id', 'contractID', False)]),
+	#PewEndpoint('corp_contract_bids', 'corp', 'contractBids', 'corporation', 8388608),
+	#PewEndpoint('corp_contract_items', 'corp', 'contractItems', 'corporation', 8388608, [PewParam('contract_id', 'contractID')]),
+
+	PewEndpoint('corp_corporation_sheet', 'corp', 'corporationsheet', 'corporation', 8),
+	PewEndpoint('corp_factional_warfare_statistics', 'corp', 'facWarStats', 'corporation', 64),
+	PewEndpoint('corp_industry_jobs', 'corp', 'industryJobs', 'corporation', 128),
+	PewEndpoint('corp_kill_log', 'corp', 'killLog', 'corporation', 256, [PewParam('before_kill_id', 'beforeKillID', False, join=False)]),
+	PewEndpoint('corp_market_orders', 'corp', 'marketorders', 'corporation', 4096),
+	PewEndpoint('corp_medals', 'corp', 'medals', 'corporation', 8192),
+	PewEndpoint('corp_member_medals', 'corp', 'membermedals', 'corporation', 4),
+	PewEndpoint('corp_member_security', 'corp', 'membersecurity', 'corporation', 512),
+	PewEndpoint('corp_member_security_log', 'corp', 'membersecuritylog', 'corporation', 1024),
+	PewEndpoint('corp_member_tracking', 'corp', 'membertracking', 'corporation', 2048),
+	PewEndpoint('corp_npc_standings', 'corp', 'standings', 'corporation', 262144),
+	PewEndpoint('corp_outpost_list', 'corp', 'outpostlist', 'corporation', 16384),
+	PewEndpoint('corp_outpost_service_detail', 'corp', 'outpostservicedetail', 'corporation', 32768),
+	PewEndpoint('corp_pos_detail', 'corp', 'starbasedetail', 'account', 131072, [PewParam('item_id', 'itemID', join=False)]),
+	PewEndpoint('corp_pos_list', 'corp', 'starbaselist', 'corporation', 524288),
+	PewEndpoint('corp_shareholders', 'corp', 'shareholders', 'corporation', 65536),
+	PewEndpoint('corp_titles', 'corp', 'titles', 'corporation', 4194304),
+	PewEndpoint('corp_wallet_journal', 'corp', 'walletjournal', 'corporation', 1048576),
+	PewEndpoint('corp_wallet_transactions', 'corp', 'wallettransactions', 'corporation', 2097152),
 
-	def eve_skill_tree(self):
-		return self._request(self._EVE_TYPE, 'skilltree')
+	# Eve API methods.
 
-	def eve_type_name(self, ids):
-		self._params['ids'] = self._join(ids)
-		return self._request(self._EVE_TYPE, 'typeName')
+	PewEndpoint('eve_alliance_list', 'eve', 'alliancelist'),
+	PewEndpoint('eve_certificate_tree', 'eve', 'certificatetree'),
+	PewEndpoint('eve_character_id', 'eve', 'characterid', params=[PewParam('character_names', 'names')]),
+	PewEndpoint('eve_character_info', 'eve', 'characterinfo', 'character'),
+	PewEndpoint('eve_character_name', 'eve', 'charactername', params=[PewParam('character_ids', 'ids')]),
+	PewEndpoint('eve_conquerable_station_list', 'eve', 'conquerablestationlist'),
+	PewEndpoint('eve_error_list', 'eve', 'errorlist'),
+	PewEndpoint('eve_factional_warfare_statistics', 'eve', 'facwarstats'),
+	PewEndpoint('eve_factional_warfare_top_statistics', 'eve', 'facwartopstats'),
+	PewEndpoint('eve_reference_types', 'eve', 'reftypes'),
+	PewEndpoint('eve_skill_tree', 'eve', 'skilltree'),
+	PewEndpoint('eve_type_name', 'eve', 'typeName', params=[PewParam('ids', 'ids')]),
 
 	# Maps API methods.
 
-	def maps_factional_warfare_systems(self):
-		return self._request(self._MAPS_TYPE, 'facwarsystems')
+	PewEndpoint('maps_factional_warfare_systems', 'map', 'facwarsystems'),
+	PewEndpoint('maps_jumps', 'map', 'jumps'),
+	PewEndpoint('maps_kills', 'map', 'kills'),
+	PewEndpoint('maps_sovereignty', 'map', 'sovereignty'),
 
-	def maps_jumps(self):
-		return self._request(self._MAPS_TYPE, 'jumps')
+	# Misc API methods.
 
-	def maps_kills(self):
-		return self._request(self._MAPS_TYPE, 'kills')
+	PewEndpoint('misc_server_status', 'server', 'serverstatus', hedge=True),
+	PewEndpoint('misc_call_list', 'api', 'CallList', 'account'),
+]
 
-	def maps_sovereignty(self):
-		return self._request(self._MAPS_TYPE, 'sovereignty')
+ENDPOINTS_BY_NAME = dict((endpoint.name, endpoint) for endpoint in ENDPOINTS)
 
-	# Misc API methods.
+def _endpoint_method(endpoint):
+
+	def method(self, *args, **kwargs):
+		return self._endpoint_request(endpoint, args, kwargs)
+
+	method.__name__ = endpoint.name
+	method.__doc__ = endpoint.docstring()
+	method.endpoint = endpoint
 
-	def misc_server_status(self):
-		return self._request('server', 'serverstatus')
+	return method
 
-	def misc_call_list(self):
-		return self._auth_request(self._API_TYPE, 'CallList')
+for _endpoint in ENDPOINTS:
+	setattr(Pew, _endpoint.name, _endpoint_method(_endpoint))
@@ -0,0 +1,180 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_bench - micro benchmarks for Pew (Python Eve Wrapper).
+#
+# Payloads are generated locally in the shape of the big API endpoints so results are
+# repeatable and don't need API keys.
+#
+# The startup benchmark runs each measurement in a fresh interpreter: import time,
+# Pew construction and the overhead of the first call against a canned response
+# (lazy imports included) compared with the second.
+#
+# Usage: python pew_bench.py [rows]
+#        python pew_bench.py startup [runs]
+#
+#---------------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import marshal
+import subprocess
+
+from pew import Pew, pack_result, unpack_result, _msgpack
+
+HEADER = '<?xml version="1.0" encoding="UTF-8"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result>'
+FOOTER = '</result><cachedUntil>2016-04-19 06:00:00</cachedUntil></eveapi>'
+
+def asset_list_xml(rows):
+	"""corp_asset_list shaped payload - every fifth item is a container with contents"""
+
+	parts = [HEADER, '<rowset name="assets" key="itemID" columns="itemID,locationID,typeID,quantity,flag,singleton">']
+
+	for i in range(rows):
+		item = '<row itemID="%d" locationID="60003760" typeID="%d" quantity="%d" flag="4" singleton="0"' % (1000000000 + i, 34 + i % 500, i % 1000 + 1)
+
+		if i % 5 == 0:
+			parts.append(item + '><rowset name="contents" key="itemID" columns="itemID,typeID,quantity,flag,singleton">')
+			parts.extend(['<row itemID="%d" typeID="%d" quantity="1" flag="5" singleton="1"/>' % (2000000000 + i * 3 + j, 587 + j) for j in range(3)])
+			parts.append('</rowset></row>')
+		else:
+			parts.append(item + '/>')
+
+	parts.append('</rowset>' + FOOTER)
+
+	return ''.join(parts)
+
+def alliance_list_xml(rows):
+	"""eve_alliance_list shaped payload - alliances with member corporation rowsets"""
+
+	parts = [HEADER, '<rowset name="alliances" key="allianceID" columns="name,shortName,allianceID,executorCorpID,memberCount,startDate">']
+
+	for i in range(rows):
+		parts.append('<row name="Alliance %d" shortName="A%d" allianceID="%d" executorCorpID="%d" memberCount="%d" startDate="2010-11-04 13:11:00">' % (i, i, 99000000 + i, 98000000 + i, i % 3000))
+		parts.append('<rowset name="memberCorporations" key="corporationID" columns="corporationID,startDate">')
+		parts.extend(['<row corporationID="%d" startDate="2011-01-01 00:00:00"/>' % (98000000 + i * 4 + j) for j in range(4)])
+		parts.append('</rowset></row>')
+
+	parts.append('</rowset>' + FOOTER)
+
+	return ''.join(parts)
+
+def wallet_journal_xml(rows):
+	"""char_wallet_journal shaped payload - flat rowset of journal entries"""
+
+	parts = [HEADER, '<rowset name="transactions" key="refID" columns="date,refID,refTypeID,ownerName1,ownerID1,ownerName2,ownerID2,argName1,argID1,amount,balance,reason">']
+
+	parts.extend(['<row date="2016-04-19 00:00:00" refID="%d" refTypeID="%d" ownerName1="Owner" ownerID1="90000001" ownerName2="Other" ownerID2="90000002" argName1="" argID1="0" amount="%d.25" balance="%d.50" reason=""/>' % (i, i % 100, i, i * 10) for i in range(rows)])
+
+	parts.append('</rowset>' + FOOTER)
+
+	return ''.join(parts)
+
+PAYLOADS = [
+	('corp_asset_list', asset_list_xml),
+	('eve_alliance_list', alliance_list_xml),
+	('char_wallet_journal', wallet_journal_xml),
+]
+
+def best_of(func, repeat = 3):
+
+	best = None
+
+	for _ in range(repeat):
+		start = time.time()
+		func()
+		elapsed = time.time() - start
+		best = elapsed if best is None else min(best, elapsed)
+
+	return best
+
+def bench_rehydrate(rows = 20000, serializers = None):
+	"""Compares re-parsing raw XML against rehydrating a cached, serialized result"""
+
+	pew = Pew()
+	results = []
+
+	for name, build in PAYLOADS:
+		xml = build(rows)
+		parse = best_of(lambda: pew._parse_xml(xml))
+
+		for serializer in serializers or [s for s in (marshal, _msgpack()) if s is not None]:
+			data = serializer.dumps(pack_result(pew._parse_xml(xml)))
+			rehydrate = best_of(lambda: unpack_result(serializer.loads(data)))
+
+			results.append((name, serializer.__name__, len(xml), len(data), parse, rehydrate))
+
+	return results
+
+# runs in a child interpreter; prints import, construction, first and second call seconds and the module count
+STARTUP_SCRIPT = '''
+import sys, time
+start = time.time()
+import pew
+imported = time.time()
+p = pew.Pew(1, 'bench')
+constructed = time.time()
+modules = len(sys.modules)
+
+class Response(object):
+	def __init__(self, xml):
+		self.xml, self.offset = xml, 0
+	def info(self):
+		return {}
+	def read(self, size = -1):
+		data = self.xml[self.offset:] if size < 0 else self.xml[self.offset:self.offset + size]
+		self.offset += len(data)
+		return data
+	def close(self):
+		pass
+
+xml = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><serverOpen>True</serverOpen><onlinePlayers>25000</onlinePlayers></result><cachedUntil>2016-04-19 00:03:00</cachedUntil></eveapi>'
+pew.urlopen = lambda request: Response(xml)
+pew.ERROR_BUDGET = p.error_budget = None
+
+first = time.time()
+p.misc_server_status()
+second = time.time()
+p.misc_server_status()
+done = time.time()
+
+print imported - start, constructed - imported, second - first, done - second, modules
+'''
+
+def bench_startup(runs = 5):
+	"""Cold start costs, best of `runs` fresh interpreters
+	OUTPUT: dict of import, construct, first_call, second_call (seconds) and modules loaded by import pew"""
+
+	here = os.path.dirname(os.path.abspath(__file__))
+	best = None
+
+	for _ in range(runs):
+		output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT], cwd=here)
+		values = [float(value) for value in output.split()]
+		best = values if best is None else [min(a, b) for a, b in zip(best, values)]
+
+	return dict(zip(('import', 'construct', 'first_call', 'second_call', 'modules'), best))
+
+def main(argv):
+
+	if len(argv) > 1 and argv[1] == 'startup':
+		startup = bench_startup(int(argv[2]) if len(argv) > 2 else 5)
+
+		print '%-14s %10s' % ('step', 'ms')
+
+		for step in ('import', 'construct', 'first_call', 'second_call'):
+			print '%-14s %10.3f' % (step, startup[step] * 1000)
+
+		print '%-14s %10d' % ('modules', startup['modules'])
+		return
+
+	rows = int(argv[1]) if len(argv) > 1 else 20000
+
+	print '%-20s %-10s %12s %12s %10s %10s %8s' % ('endpoint', 'format', 'xml bytes', 'packed', 'parse s', 'rehydr. s', 'speedup')
+
+	for name, serializer, xml_size, packed_size, parse, rehydrate in bench_rehydrate(rows):
+		print '%-20s %-10s %12d %12d %10.4f %10.4f %7.1fx' % (name, serializer, xml_size, packed_size, parse, rehydrate, parse / rehydrate)
+
+if __name__ == "__main__":
+
+	main(sys.argv)
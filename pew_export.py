@@ -0,0 +1,279 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_export - rowset export sinks for Pew (Python Eve Wrapper).
+#
+# Sinks consume a PewRowStream (see Pew.iter_rows) and write rows out in batches, so
+# large rowsets such as wallet journals, security logs and asset lists can be dumped
+# without ever building the full PewApiObject tree.
+#
+# Usage:
+#
+#	sink = PewSqliteSink('warehouse.db', 'wallet_journal')
+#	export_rowset(pew, sink, 'char_wallet_journal', character_id)
+#	print sink.stats()
+#
+# ParquetSink requires pyarrow; CSV and SQLite sinks only use the standard library.
+#
+#---------------------------------------------------------------------------------------
+
+import csv
+import time
+import marshal
+import sqlite3
+import tempfile
+
+from pew import PewError
+
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+
+# column kinds, narrowest first
+KINDS = ['int', 'float', 'string']
+
+# column kind -> pyarrow type factory
+PARQUET_TYPES = {
+	'int': lambda: pyarrow.int64(),
+	'float': lambda: pyarrow.float64(),
+	'string': lambda: pyarrow.string(),
+}
+
+def _empty(value):
+
+	return value is None or value == ''
+
+def _column_type(values):
+	"""'int', 'float' or 'string' for a column's values, ignoring empty ones (None if they all are)"""
+
+	values = [value for value in values if not _empty(value)]
+
+	if len(values) == 0:
+		return None
+
+	if all(isinstance(value, (int, long)) for value in values):
+		return 'int'
+
+	try:
+		[float(value) for value in values]
+		return 'float'
+	except (TypeError, ValueError):
+		return 'string'
+
+def _wider(kind, other):
+	"""The narrowest column kind holding values of both kinds"""
+
+	if kind is None or other is None:
+		return kind or other
+
+	return KINDS[max(KINDS.index(kind), KINDS.index(other))]
+
+def _cast(values, kind):
+
+	if kind == 'int':
+		return [None if _empty(value) else int(value) for value in values]
+	if kind == 'float':
+		return [None if _empty(value) else float(value) for value in values]
+
+	return [None if value is None else (value if isinstance(value, unicode) else str(value).decode('utf-8')) for value in values]
+
+def export_rowset(pew, sink, endpoint, *args, **kwargs):
+	"""Streams an endpoint's rowset straight into a sink
+	INPUT: Pew instance, sink, endpoint method name, its arguments, optional rowset name
+	OUTPUT: sink stats dict"""
+
+	try:
+		rows = pew.iter_rows(endpoint, *args, **kwargs)
+
+		try:
+			sink.write(rows)
+		finally:
+			# a PewRowStream holds the HTTP response open until it is closed
+			if hasattr(rows, 'close'):
+				rows.close()
+	finally:
+		sink.close()
+
+	return sink.stats()
+
+class PewSink(object):
+	"""base rowset sink - batches rows and keeps throughput stats"""
+
+	def __init__(self, columns = None, batch_size = 1000):
+
+		self.columns = columns
+		self.batch_size = batch_size
+		self.rows = 0
+		self.batches = 0
+		self.elapsed = 0.0
+
+	def write(self, rows):
+
+		start = time.time()
+		batch = []
+
+		try:
+			for row in rows:
+				if self.columns is None:
+					self.columns = getattr(rows, 'columns', None) or sorted(row)
+					self._open()
+
+				batch.append(tuple(row.get(column) for column in self.columns))
+
+				if len(batch) >= self.batch_size:
+					self._flush(batch)
+					batch = []
+
+			if len(batch) > 0:
+				self._flush(batch)
+		finally:
+			self.elapsed += time.time() - start
+
+	def close(self):
+
+		pass
+
+	def stats(self):
+
+		return {
+			'rows': self.rows,
+			'batches': self.batches,
+			'seconds': self.elapsed,
+			'rows_per_sec': self.rows / self.elapsed if self.elapsed > 0 else 0.0,
+		}
+
+	def _flush(self, batch):
+
+		self._write_batch(batch)
+		self.rows += len(batch)
+		self.batches += 1
+
+	def _open(self):
+
+		pass
+
+	def _write_batch(self, batch):
+
+		raise NotImplementedError
+
+class PewCsvSink(PewSink):
+	"""CSV sink - writes a header row followed by one line per row"""
+
+	def __init__(self, path, columns = None, batch_size = 1000):
+		super(PewCsvSink, self).__init__(columns, batch_size)
+
+		self.path = path
+		self._file = None
+		self._writer = None
+
+	def close(self):
+
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def _open(self):
+
+		self._file = open(self.path, 'wb')
+		self._writer = csv.writer(self._file)
+		self._writer.writerow(self.columns)
+
+	def _write_batch(self, batch):
+
+		self._writer.writerows([[self._encode(value) for value in row] for row in batch])
+
+	def _encode(self, value):
+
+		if isinstance(value, unicode):
+			return value.encode('utf-8')
+		return value
+
+class PewSqliteSink(PewSink):
+	"""SQLite sink - creates the table if needed and inserts each batch in one transaction"""
+
+	def __init__(self, database, table, columns = None, batch_size = 1000):
+		super(PewSqliteSink, self).__init__(columns, batch_size)
+
+		self.table = table
+		self._owned = not isinstance(database, sqlite3.Connection)
+		self._conn = sqlite3.connect(database) if self._owned else database
+		self._insert = None
+
+	def close(self):
+
+		if self._conn is not None and self._owned:
+			self._conn.close()
+		self._conn = None
+
+	def _open(self):
+
+		columns = ', '.join(['"%s"' % column for column in self.columns])
+
+		self._conn.execute('CREATE TABLE IF NOT EXISTS "%s" (%s)' % (self.table, columns))
+		self._conn.commit()
+		self._insert = 'INSERT INTO "%s" (%s) VALUES (%s)' % (self.table, columns, ', '.join(['?'] * len(self.columns)))
+
+	def _write_batch(self, batch):
+
+		with self._conn:
+			self._conn.executemany(self._insert, batch)
+
+class PewParquetSink(PewSink):
+	"""Parquet sink - writes each batch as a row group once the whole stream is seen (requires pyarrow)"""
+
+	def __init__(self, path, columns = None, batch_size = 10000):
+		super(PewParquetSink, self).__init__(columns, batch_size)
+
+		if pyarrow is None:
+			raise PewError('pyarrow is required for PewParquetSink')
+
+		self.path = path
+		self._spool = None
+		self._types = None
+
+	def close(self):
+
+		if self._spool is None:
+			return
+
+		start = time.time()
+
+		try:
+			self._write_file()
+		finally:
+			self._spool.close()
+			self._spool = None
+			self.elapsed += time.time() - start
+
+	def _write_batch(self, batch):
+
+		# iter_rows gives ints where a value parses as one and strings otherwise, and one odd
+		# value late in the stream can change a column's type, so batches wait in a spool
+		# file while the types are widened and the Parquet file is written on close()
+		if self._spool is None:
+			self._spool = tempfile.TemporaryFile()
+			self._types = [None] * len(self.columns)
+
+		self._types = [_wider(kind, _column_type(values)) for kind, values in zip(self._types, zip(*batch))]
+		marshal.dump(batch, self._spool)
+
+	def _write_file(self):
+
+		kinds = [kind or 'string' for kind in self._types]
+		schema = pyarrow.schema([pyarrow.field(name, PARQUET_TYPES[kind]()) for name, kind in zip(self.columns, kinds)])
+		writer = pyarrow.parquet.ParquetWriter(self.path, schema)
+
+		self._spool.seek(0)
+
+		try:
+			while True:
+				try:
+					batch = marshal.load(self._spool)
+				except EOFError:
+					break
+
+				arrays = [pyarrow.array(_cast(values, kind), type=PARQUET_TYPES[kind]()) for values, kind in zip(zip(*batch), kinds)]
+				writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+		finally:
+			writer.close()
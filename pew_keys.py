@@ -0,0 +1,212 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_keys - multi-key credential pool for Pew (Python Eve Wrapper).
+#
+# PewKeyPool holds many API keys, each with its own Pew object and a cached copy of
+# acct_api_key_info (type, access mask, characters). Calls are routed to a healthy key
+# that covers the character and whose access mask allows the endpoint. Authentication
+# errors (codes 200-299) that condemn the whole key (bad credentials, expired, banned
+# account...) quarantine it so bulk jobs stop spending calls on it; the others only keep
+# that key away from the failing endpoint / character.
+#
+# Usage:
+#
+#	pool = PewKeyPool.from_csv('.eve_apis', cache=PewFileCache('/tmp/pew-cache'))
+#	pool.refresh()
+#	journal = pool.call('char_wallet_journal', character_id)
+#	for key in pool.health():
+#		print key
+#
+# The CSV format is the one pew_tests.py reads: keyid,verification,nickname
+#
+#---------------------------------------------------------------------------------------
+
+import csv
+import time
+
+from pew import Pew, PewError, PewApiError, ENDPOINTS, ENDPOINTS_BY_NAME, _concurrent_map
+
+# access mask bits from the endpoint registry; endpoints not listed here work with any key
+ACCESS_MASKS = dict((endpoint.name, endpoint.access_mask) for endpoint in ENDPOINTS if endpoint.access_mask)
+
+# authentication errors about the key as a whole rather than one call made with it
+KEY_ERRORS = frozenset([202, 203, 204, 205, 210, 211, 212, 222, 223])
+
+def is_auth_error(error):
+	"""True for API errors that mean the key can't make this call (expired, wrong mask, wrong character...)"""
+
+	return isinstance(error, PewApiError) and 200 <= error.code < 300
+
+def is_key_error(error):
+	"""True for authentication errors that mean the key itself is bad, whatever it is used for"""
+
+	return isinstance(error, PewApiError) and error.code in KEY_ERRORS
+
+class PewKey(object):
+	"""pew key - one credential with its cached key info and health counters"""
+
+	def __init__(self, pew):
+
+		self.pew = pew
+		self.info = None
+		self.info_expires = 0
+		self.calls = 0
+		self.errors = 0
+		self.last_error = None
+		self.quarantined_until = 0
+		self.blocked_until = {} # (endpoint, character_id) -> timestamp, None until released
+
+	def __repr__(self):
+
+		return 'PEW Key: {} ({}, {} calls, {} errors{})'.format(self.pew.api_id, self.pew.api_nickname, self.calls, self.errors, ', quarantined' if not self.healthy() else '')
+
+	def healthy(self):
+
+		return self.quarantined_until is not None and self.quarantined_until <= time.time()
+
+	def blocked(self, endpoint, character_id = None):
+
+		until = self.blocked_until.get((endpoint, character_id), 0)
+
+		return until is None or until > time.time()
+
+	def character_ids(self):
+
+		if self.info is None:
+			return []
+
+		return [character.characterID for character in self.info.characters]
+
+	def can_serve(self, endpoint, character_id = None):
+
+		if self.blocked(endpoint, character_id):
+			return False
+
+		mask = ACCESS_MASKS.get(endpoint)
+
+		if mask is None:
+			return True
+
+		if self.info is None or not self.info.accessMask & mask:
+			return False
+
+		if (self.info.type == 'Corporation') != (ENDPOINTS_BY_NAME[endpoint].api_type == 'corp'):
+			return False
+
+		return character_id is None or character_id in self.character_ids()
+
+class PewKeyPool(object):
+	"""pew key pool - routes calls across many API keys and keeps bad keys out of rotation"""
+
+	def __init__(self, cache = None, threads = 8, quarantine = 6 * 3600):
+
+		self.cache = cache
+		self.threads = threads
+		self.quarantine = quarantine # seconds, or None to keep bad keys out until release()
+		self.keys = []
+
+	@classmethod
+	def from_csv(cls, path, **kwargs):
+
+		pool = cls(**kwargs)
+
+		with open(path, 'rb') as f:
+			for row in csv.reader(f, delimiter=',', quotechar='\''):
+				if len(row) >= 2:
+					pool.add(row[0], row[1], row[2] if len(row) > 2 else None)
+
+		return pool
+
+	def add(self, api_id, api_key, api_nickname = None):
+
+		key = PewKey(Pew(api_id, api_key, api_nickname, cache=self.cache))
+		self.keys.append(key)
+
+		return key
+
+	def refresh(self, force = False):
+		"""Fetches acct_api_key_info for every key whose copy has expired, concurrently"""
+
+		now = time.time()
+		stale = [key for key in self.keys if key.healthy() and (force or key.info_expires <= now)]
+
+		_concurrent_map(self._refresh_key, stale, self.threads)
+
+	def keys_for(self, endpoint, character_id = None):
+		"""Healthy keys able to serve an endpoint for a character, least used first"""
+
+		self.refresh()
+
+		return sorted([key for key in self.keys if key.healthy() and key.can_serve(endpoint, character_id)], key=lambda key: key.calls)
+
+	def call(self, endpoint, *args, **kwargs):
+		"""Calls an endpoint with the first suitable key, moving on to the next if a key fails auth"""
+
+		character_id = self._character_id(endpoint, args)
+		keys = self.keys_for(endpoint, character_id)
+
+		if len(keys) == 0:
+			raise PewError('no healthy key can serve %s for %s' % (endpoint, character_id))
+
+		for key in keys:
+			try:
+				return self._call(key, endpoint, *args, **kwargs)
+			except PewApiError as er:
+				if not is_auth_error(er):
+					raise
+				error = er
+
+		raise error
+
+	def release(self, key):
+
+		key.quarantined_until = 0
+		key.blocked_until.clear()
+
+	def health(self):
+
+		return [{
+			'api_id': key.pew.api_id,
+			'nickname': key.pew.api_nickname,
+			'type': key.info.type if key.info is not None else None,
+			'characters': key.character_ids(),
+			'calls': key.calls,
+			'errors': key.errors,
+			'last_error': key.last_error,
+			'healthy': key.healthy(),
+			'blocked': sorted(call for call in key.blocked_until if key.blocked(*call)),
+		} for key in self.keys]
+
+	def _refresh_key(self, key):
+
+		try:
+			result = self._call(key, 'acct_api_key_info')
+		except PewError:
+			return
+
+		key.info = result.key
+		key.info_expires = time.time() + max(key.pew.result_ttl(result), 300)
+
+	def _character_id(self, endpoint, args):
+
+		return args[0] if endpoint in ACCESS_MASKS and ENDPOINTS_BY_NAME[endpoint].key in ('character', 'corporation') and len(args) > 0 else None
+
+	def _call(self, key, endpoint, *args, **kwargs):
+
+		key.calls += 1
+
+		try:
+			return getattr(key.pew, endpoint)(*args, **kwargs)
+		except PewError as er:
+			key.errors += 1
+			key.last_error = str(er)
+
+			if is_auth_error(er):
+				until = time.time() + self.quarantine if self.quarantine is not None else None
+
+				if is_key_error(er):
+					key.quarantined_until = until
+				else:
+					key.blocked_until[(endpoint, self._character_id(endpoint, args))] = until
+
+			raise
@@ -0,0 +1,112 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_kills - deduplicated killmail stream for Pew (Python Eve Wrapper).
+#
+# PewKillStream pages char_kill_log / corp_kill_log backwards with beforeKillID and
+# yields only new kills (each with its victim, attackers and items). Seen killIDs live
+# in one small SQLite index shared by every key, so a kill reported by several
+# characters and corporations is only yielded the first time. When to stop paging is
+# decided per source instead: each (key, char / corp, characterID) keeps the newest
+# killID of its last complete pass, and paging stops once a page reaches it.
+#
+# A kill is marked seen when the consumer asks for the next one (or the stream ends),
+# so a consumer that stops or crashes mid-stream gets the unhandled kills again.
+#
+# Usage:
+#
+#	kills = PewKillStream('kills.db')
+#	for kill in kills.new_kills(pew, character_id):
+#		print kill.killID, kill.victim.shipTypeID, len(kill.attackers), len(kill.items)
+#	for kill in kills.new_kills(corp_pew, character_id, corp=True):
+#		...
+#
+#---------------------------------------------------------------------------------------
+
+import sqlite3
+
+from pew import PewApiError
+
+KILLS_EXHAUSTED = 119 # the API's answer to a beforeKillID past the oldest kill it keeps
+
+class PewKillStream(object):
+	"""pew kill stream - yields each killmail once, however many keys can see it"""
+
+	def __init__(self, database = ':memory:', max_pages = 50):
+
+		self.max_pages = max_pages
+		self.calls = 0
+		self._conn = sqlite3.connect(database)
+		self._conn.execute('CREATE TABLE IF NOT EXISTS kills (kill_id INTEGER PRIMARY KEY)')
+		self._conn.execute('CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, high_water INTEGER)')
+		self._conn.commit()
+
+	def close(self):
+
+		self._conn.close()
+
+	def new_kills(self, pew, character_id, corp = False):
+		"""Yields kills not seen before from one character's (or its corporation's) kill log, newest first"""
+
+		endpoint = getattr(pew, 'corp_kill_log' if corp else 'char_kill_log')
+		source = '%s:%s:%s' % (pew.api_id, 'corp' if corp else 'char', character_id)
+		high_water = self.high_water(source)
+		newest = high_water
+		before_kill_id = None
+
+		for page in range(self.max_pages):
+			try:
+				self.calls += 1
+				kills = endpoint(character_id, before_kill_id).kills
+			except PewApiError as er:
+				if er.code != KILLS_EXHAUSTED:
+					raise
+				kills = []
+
+			if len(kills) > 0:
+				newest = max(newest, max(kill.killID for kill in kills))
+				known = self._known([kill.killID for kill in kills])
+
+				for kill in kills:
+					if kill.killID not in known:
+						yield kill
+						self._mark_seen(kill.killID)
+
+			# the rest of this source's log was covered by its last complete pass
+			if len(kills) == 0 or min(kill.killID for kill in kills) <= high_water:
+				if newest > high_water:
+					with self._conn:
+						self._conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?)', (source, newest))
+				return
+
+			before_kill_id = min(kill.killID for kill in kills)
+
+	def high_water(self, source):
+		"""Newest killID of a source's last complete pass, 0 if it has never finished one"""
+
+		row = self._conn.execute('SELECT high_water FROM sources WHERE source = ?', (source,)).fetchone()
+
+		return row[0] if row is not None else 0
+
+	def seen(self, kill_id):
+
+		return self._conn.execute('SELECT 1 FROM kills WHERE kill_id = ?', (kill_id,)).fetchone() is not None
+
+	def __len__(self):
+
+		return self._conn.execute('SELECT COUNT(*) FROM kills').fetchone()[0]
+
+	def _mark_seen(self, kill_id):
+
+		with self._conn:
+			self._conn.execute('INSERT OR IGNORE INTO kills VALUES (?)', (kill_id,))
+
+	def _known(self, kill_ids):
+
+		known = set()
+
+		# stay under SQLite's limit on bound parameters
+		for start in range(0, len(kill_ids), 500):
+			batch = kill_ids[start:start + 500]
+			known.update(row[0] for row in self._conn.execute('SELECT kill_id FROM kills WHERE kill_id IN (%s)' % ','.join('?' * len(batch)), batch))
+
+		return known
@@ -0,0 +1,352 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_load - load testing for Pew (Python Eve Wrapper) against a simulated API.
+#
+# PewSimulatedApi is a local, threaded HTTP server that answers any registry endpoint
+# with generated XML: latency is drawn from a log-normal distribution, payload sizes
+# are set per endpoint, a share of responses are API errors, and every response
+# carries a cachedUntil. run_load() points N worker threads or processes (one Pew
+# each) at it with a weighted endpoint mix and collects throughput, latency
+# percentiles, CPU time and peak memory.
+#
+# Usage: python pew_load.py [--workers 8] [--processes] [--calls 200]
+#                           [--mix char_wallet_journal:5,misc_server_status:1]
+#                           [--latency 0.05] [--sigma 0.5] [--error-rate 0.01] [--rows 500]
+#
+#---------------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import math
+import random
+import argparse
+import threading
+from multiprocessing import Pool
+from SocketServer import ThreadingMixIn
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from pew import Pew, PewError, ENDPOINTS, ENDPOINTS_BY_NAME
+from pew_bench import HEADER, FOOTER, asset_list_xml, alliance_list_xml, wallet_journal_xml
+
+try:
+	import resource
+except ImportError:
+	resource = None # not on Windows; CPU time then comes from os.times() and max RSS is left out
+
+# endpoint -> payload generator; everything else gets a generic rowset
+PAYLOAD_SHAPES = {
+	'char_asset_list': asset_list_xml,
+	'corp_asset_list': asset_list_xml,
+	'eve_alliance_list': alliance_list_xml,
+	'char_wallet_journal': wallet_journal_xml,
+	'corp_wallet_journal': wallet_journal_xml,
+}
+
+# the simulator doesn't answer the third party (emd / ecent) endpoints, and a mix must not send load to them
+SIMULATED = frozenset(endpoint.name for endpoint in ENDPOINTS if endpoint.api_type not in ('emd', 'ecent'))
+
+DEFAULT_MIX = {'char_wallet_journal': 5, 'char_asset_list': 2, 'char_skill_in_training': 2, 'misc_server_status': 1}
+
+def generic_xml(rows):
+
+	rows = ''.join('<row id="%d" value="%d" name="Row %d"/>' % (i, i * 7, i) for i in range(rows))
+
+	return '%s<rowset name="rows" key="id" columns="id,value,name">%s</rowset>%s' % (HEADER, rows, FOOTER)
+
+def _api_time(timestamp):
+
+	return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(timestamp))
+
+def _percentile(values, percent):
+
+	if len(values) == 0:
+		return None
+
+	values = sorted(values)
+
+	return values[max(int(math.ceil(len(values) * percent / 100.0)) - 1, 0)]
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+
+	daemon_threads = True
+
+class _Handler(BaseHTTPRequestHandler):
+
+	def do_GET(self):
+
+		api = self.server.api
+		path = self.path.split('?', 1)[0]
+		endpoint = api.paths.get(path)
+
+		time.sleep(api.latency())
+
+		now = time.time()
+
+		if endpoint is None:
+			self.send_error(404)
+			return
+
+		if api.random.random() < api.error_rate:
+			body = '<?xml version="1.0"?><eveapi version="2"><currentTime>%s</currentTime><error code="520">Unexpected failure accessing database.</error><cachedUntil>%s</cachedUntil></eveapi>' % (_api_time(now), _api_time(now + api.error_cache))
+		else:
+			body = '%s<currentTime>%s</currentTime><result>%s</result><cachedUntil>%s</cachedUntil></eveapi>' % (api.prefix, _api_time(now), api.payload(endpoint), _api_time(now + api.cache_seconds))
+
+		api.count(endpoint)
+
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/xml; charset=utf-8')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+
+		pass
+
+class PewSimulatedApi(object):
+	"""pew simulated api - local EVE API stand-in with configurable latency, sizes and errors"""
+
+	prefix = '<?xml version="1.0" encoding="UTF-8"?><eveapi version="2">'
+
+	def __init__(self, latency = 0.05, sigma = 0.5, rows = None, default_rows = 50, error_rate = 0.0, cache_seconds = 300, error_cache = 60, port = 0, seed = None):
+
+		self.median_latency = latency # seconds; 0 answers immediately
+		self.sigma = sigma # log-normal shape, 0 makes every response take exactly `latency`
+		self.rows = rows or {} # endpoint -> rows in its payload
+		self.default_rows = default_rows
+		self.error_rate = error_rate
+		self.cache_seconds = cache_seconds
+		self.error_cache = error_cache
+		self.random = random.Random(seed)
+		self.requests = {}
+		self.paths = dict(('/%s/%s.xml.aspx' % (e.api_type, e.method_name), e.name) for e in ENDPOINTS if e.name in SIMULATED)
+		self._payloads = {}
+		self._lock = threading.Lock()
+		self._server = _ThreadingServer(('127.0.0.1', port), _Handler)
+		self._server.api = self
+		self._thread = None
+
+	@property
+	def url(self):
+
+		return 'http://127.0.0.1:%d' % self._server.server_address[1]
+
+	def start(self):
+
+		self._thread = threading.Thread(target=self._server.serve_forever)
+		self._thread.daemon = True
+		self._thread.start()
+
+		return self
+
+	def stop(self):
+
+		self._server.shutdown()
+		self._server.server_close()
+
+	def latency(self):
+
+		if self.median_latency <= 0:
+			return 0
+
+		with self._lock:
+			return self.random.lognormvariate(math.log(self.median_latency), self.sigma)
+
+	def payload(self, endpoint):
+		"""The <result> contents for an endpoint, generated once and reused"""
+
+		with self._lock:
+			if endpoint not in self._payloads:
+				xml = PAYLOAD_SHAPES.get(endpoint, generic_xml)(self.rows.get(endpoint, self.default_rows))
+				self._payloads[endpoint] = xml[len(HEADER):-len(FOOTER)]
+
+			return self._payloads[endpoint]
+
+	def count(self, endpoint):
+
+		with self._lock:
+			self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+def endpoint_args(endpoint, character_id = 90000001):
+	"""Placeholder arguments that satisfy an endpoint's required parameters"""
+
+	args = [character_id] if endpoint.key in ('character', 'corporation') else []
+
+	return args + [1 for param in endpoint.params if param.required]
+
+def parse_mix(text):
+	"""'char_wallet_journal:5,misc_server_status:1' -> {'char_wallet_journal': 5, 'misc_server_status': 1}"""
+
+	mix = {}
+
+	for item in text.split(','):
+		name, _, weight = item.partition(':')
+
+		if name not in ENDPOINTS_BY_NAME:
+			raise PewError('unknown endpoint in mix: %s' % name)
+
+		if name not in SIMULATED:
+			raise PewError('endpoint in mix is not simulated: %s' % name)
+
+		mix[name] = float(weight or 1)
+
+	return mix
+
+def _usage():
+
+	if resource is None:
+		times = os.times()
+		return times[0] + times[1], None
+
+	usage = resource.getrusage(resource.RUSAGE_SELF)
+
+	return usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+def _worker(job):
+	"""One load worker: its own Pew object making `calls` calls drawn from the mix"""
+
+	worker_id, url, mix, calls, seed = job
+
+	pew = Pew(1, 'load')
+	pew.api_url = url
+	pew.error_budget = None # the simulator's error rate is the thing being measured, don't back off from it
+	pew.cache_errors = False # nor answer repeat calls from the negative cache
+	chooser = random.Random(seed + worker_id)
+	names = sorted(mix)
+	weights = [mix[name] for name in names]
+	total = sum(weights)
+	latencies = {}
+	errors = 0
+	cpu_start, _ = _usage()
+	start = time.time()
+
+	for _ in range(calls):
+		pick = chooser.uniform(0, total)
+
+		for name, weight in zip(names, weights):
+			pick -= weight
+			if pick <= 0:
+				break
+
+		began = time.time()
+
+		try:
+			getattr(pew, name)(*endpoint_args(ENDPOINTS_BY_NAME[name]))
+		except PewError:
+			errors += 1
+
+		latencies.setdefault(name, []).append(time.time() - began)
+
+	cpu_end, max_rss = _usage()
+
+	return {'worker': worker_id, 'pid': os.getpid(), 'calls': calls, 'errors': errors, 'elapsed': time.time() - start, 'cpu': cpu_end - cpu_start, 'max_rss_kb': max_rss, 'latencies': latencies}
+
+def run_load(url, mix = None, workers = 4, calls = 100, processes = False, seed = 0):
+	"""Drives `workers` threads (or processes) against url and summarizes the run
+	OUTPUT: dict with throughput, latency percentiles per endpoint and per-worker CPU / memory.
+	Threads share one process, so their cpu and max_rss_kb are the whole process' numbers."""
+
+	jobs = [(i, url, mix or DEFAULT_MIX, calls, seed) for i in range(workers)]
+	cpu_start, _ = _usage()
+	start = time.time()
+
+	if processes:
+		pool = Pool(workers)
+
+		try:
+			results = pool.map(_worker, jobs)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		results = [None] * workers
+		failures = []
+
+		def run(job):
+			try:
+				results[job[0]] = _worker(job)
+			except Exception:
+				failures.append(sys.exc_info())
+
+		threads = [threading.Thread(target=run, args=(job,)) for job in jobs]
+
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		# a worker that died on something other than an API error fails the run, as it does with processes
+		if len(failures) > 0:
+			raise failures[0][0], failures[0][1], failures[0][2]
+
+		cpu_end, max_rss = _usage()
+
+		for result in results:
+			result['cpu'] = cpu_end - cpu_start
+			result['max_rss_kb'] = max_rss
+
+	elapsed = time.time() - start
+	latencies = {}
+
+	for result in results:
+		for name, values in result.pop('latencies').items():
+			latencies.setdefault(name, []).extend(values)
+
+	every = [value for values in latencies.values() for value in values]
+	summary = lambda values: dict(count=len(values), p50=_percentile(values, 50), p90=_percentile(values, 90), p99=_percentile(values, 99), max=max(values))
+
+	return {
+		'workers': workers,
+		'mode': 'processes' if processes else 'threads',
+		'calls': len(every),
+		'errors': sum(result['errors'] for result in results),
+		'elapsed': elapsed,
+		'throughput': len(every) / elapsed if elapsed > 0 else 0,
+		'latency': summary(every) if len(every) > 0 else None,
+		'endpoints': dict((name, summary(values)) for name, values in latencies.items()),
+		'per_worker': results,
+	}
+
+def main(argv):
+
+	parser = argparse.ArgumentParser(description='Load test Pew against a simulated EVE API')
+	parser.add_argument('--workers', type=int, default=8)
+	parser.add_argument('--processes', action='store_true', help='one process per worker instead of threads')
+	parser.add_argument('--calls', type=int, default=200, help='calls per worker')
+	parser.add_argument('--mix', default=','.join('%s:%d' % item for item in sorted(DEFAULT_MIX.items())))
+	parser.add_argument('--latency', type=float, default=0.05, help='median response latency, seconds')
+	parser.add_argument('--sigma', type=float, default=0.5, help='log-normal latency spread')
+	parser.add_argument('--error-rate', type=float, default=0.01)
+	parser.add_argument('--rows', type=int, default=500, help='rows per payload')
+	parser.add_argument('--cache-seconds', type=int, default=300)
+	parser.add_argument('--url', help='load an already running API instead of starting a simulator')
+	options = parser.parse_args(argv[1:])
+
+	api = None
+
+	if options.url is None:
+		api = PewSimulatedApi(options.latency, options.sigma, default_rows=options.rows, error_rate=options.error_rate, cache_seconds=options.cache_seconds, seed=1).start()
+
+	try:
+		report = run_load(options.url or api.url, parse_mix(options.mix), options.workers, options.calls, options.processes)
+	finally:
+		if api is not None:
+			api.stop()
+
+	print '%d %s, %d calls (%d errors) in %.2fs: %.1f calls/s' % (report['workers'], report['mode'], report['calls'], report['errors'], report['elapsed'], report['throughput'])
+	print
+	print '%-28s %8s %9s %9s %9s %9s' % ('endpoint', 'calls', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms')
+
+	for name, stats in sorted(report['endpoints'].items()) + [('all', report['latency'])]:
+		print '%-28s %8d %9.1f %9.1f %9.1f %9.1f' % (name, stats['count'], stats['p50'] * 1000, stats['p90'] * 1000, stats['p99'] * 1000, stats['max'] * 1000)
+
+	print
+	print '%-8s %8s %8s %8s %10s %12s' % ('worker', 'pid', 'calls', 'errors', 'cpu s', 'max rss KB')
+
+	for result in report['per_worker']:
+		print '%-8d %8d %8d %8d %10.2f %12s' % (result['worker'], result['pid'], result['calls'], result['errors'], result['cpu'], result['max_rss_kb'] if result['max_rss_kb'] is not None else '-')
+
+if __name__ == "__main__":
+
+	main(sys.argv)
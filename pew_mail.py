@@ -0,0 +1,105 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_mail - incremental mail and notification sync for Pew (Python Eve Wrapper).
+#
+# PewMailSync polls the mail / notification headers, asks char_mail_bodies or
+# char_notification_texts only for IDs it has never fetched (in batches), and keeps
+# every body in a local SQLite database so nothing is downloaded twice.
+#
+# Usage:
+#
+#	sync = PewMailSync(pew, 'mail.db')
+#	for message in sync.new_messages(character_id):
+#		print message.title, message.body
+#	for notification in sync.new_notifications(character_id):
+#		print notification.typeID, notification.body
+#
+#---------------------------------------------------------------------------------------
+
+import marshal
+import sqlite3
+
+from pew import pack_result, unpack_result
+
+# kind -> (headers endpoint, headers rowset, ID attribute, bodies endpoint, bodies rowset)
+SYNC_KINDS = {
+	'mail': ('char_mail_messages', 'messages', 'messageID', 'char_mail_bodies', 'messages'),
+	'notification': ('char_notifications', 'notifications', 'notificationID', 'char_notification_texts', 'notifications'),
+}
+
+class PewMailSync(object):
+	"""pew mail sync - fetches each mail / notification body once and stores it locally"""
+
+	def __init__(self, pew, database = ':memory:', batch_size = 50):
+
+		self.pew = pew
+		self.batch_size = batch_size
+		self.calls = 0
+		self._conn = sqlite3.connect(database)
+		self._conn.execute('CREATE TABLE IF NOT EXISTS bodies (kind TEXT, character_id INTEGER, id INTEGER, header BLOB, body TEXT, PRIMARY KEY (kind, character_id, id))')
+		self._conn.commit()
+
+	def close(self):
+
+		self._conn.close()
+
+	def new_messages(self, character_id):
+
+		return self.sync('mail', character_id)
+
+	def new_notifications(self, character_id):
+
+		return self.sync('notification', character_id)
+
+	def sync(self, kind, character_id):
+		"""Yields headers that haven't been seen before, oldest first, each with a .body attribute"""
+
+		headers_endpoint, headers_rowset, id_attr, bodies_endpoint, bodies_rowset = SYNC_KINDS[kind]
+
+		self.calls += 1
+		headers = getattr(getattr(self.pew, headers_endpoint)(character_id), headers_rowset)
+		known = self._known(kind, character_id)
+		new = sorted([header for header in headers if getattr(header, id_attr) not in known], key=lambda header: getattr(header, id_attr))
+
+		for start in range(0, len(new), self.batch_size):
+			batch = new[start:start + self.batch_size]
+
+			self.calls += 1
+			bodies = getattr(getattr(self.pew, bodies_endpoint)(character_id, [getattr(header, id_attr) for header in batch]), bodies_rowset)
+			texts = dict((getattr(row, id_attr), getattr(row, '_value', '')) for row in bodies)
+
+			fetched = []
+
+			for header in batch:
+				# IDs the API lists as missing are left out and asked for again next time
+				if getattr(header, id_attr) in texts:
+					header.body = texts[getattr(header, id_attr)]
+					fetched.append(header)
+
+			# stored once the caller has it, so one abandoned mid-way gets the rest again next time
+			for header in fetched:
+				yield header
+				self._store(kind, character_id, getattr(header, id_attr), header)
+
+	def body(self, kind, character_id, item_id):
+		"""A stored body, or None if it hasn't been fetched"""
+
+		row = self._conn.execute('SELECT body FROM bodies WHERE kind = ? AND character_id = ? AND id = ?', (kind, character_id, item_id)).fetchone()
+
+		return row[0] if row is not None else None
+
+	def stored(self, kind, character_id):
+		"""Every stored header (with .body) for a character, oldest first"""
+
+		rows = self._conn.execute('SELECT header FROM bodies WHERE kind = ? AND character_id = ? ORDER BY id', (kind, character_id))
+
+		return [unpack_result(marshal.loads(str(row[0]))) for row in rows]
+
+	def _store(self, kind, character_id, item_id, header):
+
+		with self._conn:
+			self._conn.execute('INSERT OR REPLACE INTO bodies VALUES (?, ?, ?, ?, ?)', (kind, character_id, item_id, sqlite3.Binary(marshal.dumps(pack_result(header))), header.body))
+
+	def _known(self, kind, character_id):
+
+		return set(row[0] for row in self._conn.execute('SELECT id FROM bodies WHERE kind = ? AND character_id = ?', (kind, character_id)))
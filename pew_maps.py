@@ -0,0 +1,180 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_maps - indexed, time-series store for map data in Pew (Python Eve Wrapper).
+#
+# Each refresh of maps_jumps, maps_kills, maps_sovereignty or
+# maps_factional_warfare_systems is streamed into a PewMapSnapshot: solarSystemIDs in a
+# sorted array (looked up by bisection) plus one compact array per numeric column.
+# Snapshots are stamped with the API's dataTime (or currentTime), so refreshing again
+# before the API has new data replaces the stored copy instead of counting it twice.
+# The last `history` hours of snapshots of every kind are kept, so per-system lookups
+# and questions over the last N hours never touch the XML again.
+#
+# Usage:
+#
+#	store = PewMapStore(pew, history=48)
+#	store.refresh()                                  # e.g. once an hour
+#	store.total('kills', 30000142, 'shipKills', hours=6)
+#	store.sov_changes(hours=24)
+#
+#---------------------------------------------------------------------------------------
+
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+# kind -> (endpoint, numeric columns kept per system)
+MAP_KINDS = {
+	'jumps': ('maps_jumps', ['shipJumps']),
+	'kills': ('maps_kills', ['shipKills', 'factionKills', 'podKills']),
+	'sovereignty': ('maps_sovereignty', ['allianceID', 'factionID', 'corporationID']),
+	'fw': ('maps_factional_warfare_systems', ['occupyingFactionID', 'owningFactionID', 'contested', 'victoryPoints', 'victoryPointThreshold']),
+}
+
+def _int(value):
+
+	if isinstance(value, int):
+		return value
+	if value == 'True':
+		return 1
+	if value in ('False', '', None):
+		return 0
+	return int(value)
+
+class PewMapSnapshot(object):
+	"""pew map snapshot - one endpoint's whole-universe rowset as sorted, columnar arrays"""
+
+	def __init__(self, kind, rows, columns, timestamp = None):
+
+		rows = sorted(rows, key=lambda row: row['solarSystemID'])
+
+		self.kind = kind
+		self.timestamp = timestamp or time.time()
+		self.system_ids = array('l', [row['solarSystemID'] for row in rows])
+		self.columns = dict((column, array('l', [_int(row.get(column)) for row in rows])) for column in columns)
+
+	def __len__(self):
+
+		return len(self.system_ids)
+
+	def __repr__(self):
+
+		return 'PEW Map Snapshot: {} ({} systems @ {})'.format(self.kind, len(self), self.timestamp)
+
+	def get(self, system_id, column, default = None):
+
+		i = bisect_left(self.system_ids, system_id)
+
+		if i < len(self.system_ids) and self.system_ids[i] == system_id:
+			return self.columns[column][i]
+
+		return default
+
+	def row(self, system_id):
+
+		i = bisect_left(self.system_ids, system_id)
+
+		if i < len(self.system_ids) and self.system_ids[i] == system_id:
+			return dict((column, values[i]) for column, values in self.columns.items())
+
+		return None
+
+class PewMapStore(object):
+	"""pew map store - bounded history of map snapshots with per-system queries"""
+
+	def __init__(self, pew, history = 24):
+
+		self.pew = pew
+		self.history = history # hours of snapshots kept per kind
+		self.names = {}
+		self._snapshots = dict((kind, deque()) for kind in MAP_KINDS)
+
+	def refresh(self, kinds = None):
+		"""Fetches a snapshot of each kind (all of them by default), stamped with the API's dataTime"""
+
+		for kind in kinds or sorted(MAP_KINDS):
+			stream = self.pew.iter_rows(MAP_KINDS[kind][0])
+			rows = list(stream)
+			stamp = stream.dataTime or stream.currentTime
+
+			self.add(kind, rows, self.pew._parse_time(stamp) if stamp else None)
+
+	def add(self, kind, rows, timestamp = None):
+		"""Stores a snapshot from any iterable of row dicts (e.g. PewRowStream), replacing one with the same timestamp"""
+
+		rows = list(rows)
+
+		for row in rows:
+			if row.get('solarSystemName'):
+				self.names[row['solarSystemID']] = row['solarSystemName']
+
+		snapshot = PewMapSnapshot(kind, rows, MAP_KINDS[kind][1], timestamp)
+		snapshots = self._snapshots[kind]
+
+		for i, stored in enumerate(snapshots):
+			if stored.timestamp == snapshot.timestamp:
+				snapshots[i] = snapshot
+				break
+		else:
+			snapshots.append(snapshot)
+
+		newest = max(stored.timestamp for stored in snapshots)
+
+		while len(snapshots) > 1 and snapshots[0].timestamp <= newest - self.history * 3600:
+			snapshots.popleft()
+
+		return snapshot
+
+	def latest(self, kind):
+
+		snapshots = self._snapshots[kind]
+
+		return snapshots[-1] if len(snapshots) > 0 else None
+
+	def snapshots(self, kind, hours = None):
+		"""Snapshots of one kind, oldest first, optionally only those from the last N hours"""
+
+		if hours is None:
+			return list(self._snapshots[kind])
+
+		since = time.time() - hours * 3600
+
+		return [snapshot for snapshot in self._snapshots[kind] if snapshot.timestamp >= since]
+
+	def get(self, kind, system_id, column, default = None):
+
+		snapshot = self.latest(kind)
+
+		return snapshot.get(system_id, column, default) if snapshot is not None else default
+
+	def series(self, kind, system_id, column, hours = None):
+		"""(timestamp, value) pairs for one system; systems missing from jumps / kills count as 0"""
+
+		return [(snapshot.timestamp, snapshot.get(system_id, column, 0)) for snapshot in self.snapshots(kind, hours)]
+
+	def total(self, kind, system_id, column, hours = None):
+
+		return sum(value for timestamp, value in self.series(kind, system_id, column, hours))
+
+	def changed(self, kind, columns = None, hours = None):
+		"""Systems whose columns changed between consecutive snapshots
+		OUTPUT: list of (timestamp, solarSystemID, old row, new row)"""
+
+		snapshots = self.snapshots(kind, hours)
+		columns = columns or MAP_KINDS[kind][1]
+		changes = []
+
+		for old, new in zip(snapshots, snapshots[1:]):
+			for system_id in sorted(set(old.system_ids) | set(new.system_ids)):
+				before = old.row(system_id)
+				after = new.row(system_id)
+
+				if before is None or after is None or any(before[column] != after[column] for column in columns):
+					changes.append((new.timestamp, system_id, before, after))
+
+		return changes
+
+	def sov_changes(self, hours = None):
+
+		return self.changed('sovereignty', ['allianceID', 'factionID'], hours)
@@ -0,0 +1,199 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_market - market data engine for Pew (Python Eve Wrapper).
+#
+# PewMarket prices many typeIDs across many regions with as few calls as possible:
+# missing (typeID, regionID) pairs are grouped into batches for emd_item_prices (or
+# ecent_market_stat, one call per region), quotes are cached for a TTL, and the orders
+# from emd_item_orders are indexed into one PewOrderBook per (typeID, regionID).
+#
+# Usage:
+#
+#	market = PewMarket(pew, ttl=300)
+#	quotes = market.quotes([34, 35, 36], [10000002, 10000043])
+#	market.refresh_orders([34], [10000002])
+#	book = market.book(34, 10000002)
+#	print book.best_bid(), book.best_ask(), book.vwap('sell')
+#
+# Order book math uses NumPy when it's installed and plain Python otherwise.
+#
+#---------------------------------------------------------------------------------------
+
+import time
+from array import array
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+def _chunks(lst, size):
+
+	return [lst[i:i + size] for i in range(0, len(lst), size)]
+
+def _rows(result):
+	"""Returns the first rowset of an API result"""
+
+	for value in result.__dict__.values():
+		if isinstance(value, list):
+			return value
+
+	return []
+
+def _stat_price(stat, side, field):
+	"""One price from an eve-central marketstat <type>, None where the side or field is missing"""
+
+	value = getattr(getattr(stat, side, None), field, None)
+
+	return float(value) if value not in (None, '') else None
+
+class PewOrderBook(object):
+	"""pew order book - bid and ask prices / volumes for one typeID in one region, stored as columns"""
+
+	def __init__(self, type_id, region_id, bids = None, asks = None):
+
+		self.type_id = type_id
+		self.region_id = region_id
+		self.updated = time.time()
+		self._columns = {}
+
+		for side, orders in (('buy', bids or []), ('sell', asks or [])):
+			self._columns[side] = (self._column([price for price, volume in orders]), self._column([volume for price, volume in orders]))
+
+	def __repr__(self):
+
+		return 'PEW Order Book: type {} region {} bid {} ask {}'.format(self.type_id, self.region_id, self.best_bid(), self.best_ask())
+
+	def best_bid(self):
+
+		prices = self._columns['buy'][0]
+
+		if len(prices) == 0:
+			return None
+
+		return float(prices.max() if numpy is not None else max(prices))
+
+	def best_ask(self):
+
+		prices = self._columns['sell'][0]
+
+		if len(prices) == 0:
+			return None
+
+		return float(prices.min() if numpy is not None else min(prices))
+
+	def volume(self, side):
+
+		volumes = self._columns[side][1]
+
+		return float(volumes.sum() if numpy is not None else sum(volumes))
+
+	def vwap(self, side):
+		"""Volume weighted average price of one side ('buy' or 'sell'), None if it is empty"""
+
+		prices, volumes = self._columns[side]
+
+		if numpy is not None:
+			total = volumes.sum()
+			return float(numpy.dot(prices, volumes) / total) if total > 0 else None
+
+		total = sum(volumes)
+
+		return sum(p * v for p, v in zip(prices, volumes)) / total if total > 0 else None
+
+	def _column(self, values):
+
+		if numpy is not None:
+			return numpy.array(values, dtype=numpy.float64)
+
+		return array('d', values)
+
+class PewMarket(object):
+	"""pew market engine - batched quotes with a TTL cache plus per type/region order books"""
+
+	def __init__(self, pew, ttl = 300, source = 'emd', batch_types = 100, batch_regions = 10):
+
+		self.pew = pew
+		self.ttl = ttl
+		self.source = source
+		self.batch_types = batch_types
+		self.batch_regions = batch_regions
+		self.calls = 0
+		self._quotes = {}
+		self._books = {}
+
+	def quotes(self, type_ids, region_ids):
+		"""Buy / sell prices for every typeID in every region, fetching only stale or missing pairs
+		INPUT: type_ids, region_ids
+		OUTPUT: dict of (typeID, regionID) -> {'buy': price, 'sell': price}"""
+
+		now = time.time()
+		missing = [(t, r) for t in type_ids for r in region_ids if self._quotes.get((t, r), (0, None))[0] <= now]
+
+		# regions missing the same types are fetched together, so pairs still fresh aren't asked for again
+		types_by_region = {}
+		regions_by_types = {}
+
+		for t, r in missing:
+			types_by_region.setdefault(r, set()).add(t)
+
+		for r, types in types_by_region.items():
+			regions_by_types.setdefault(frozenset(types), []).append(r)
+
+		for types, regions in regions_by_types.items():
+			self._fetch_quotes(sorted(types), sorted(regions))
+
+		return dict(((t, r), self._quotes[(t, r)][1]) for t in type_ids for r in region_ids if (t, r) in self._quotes)
+
+	def quote(self, type_id, region_id):
+
+		return self.quotes([type_id], [region_id]).get((type_id, region_id))
+
+	def refresh_orders(self, type_ids, region_ids):
+		"""Rebuilds the order books of every typeID / regionID pair from emd_item_orders"""
+
+		orders = {}
+
+		for types in _chunks(list(type_ids), self.batch_types):
+			for regions in _chunks(list(region_ids), self.batch_regions):
+				for row in self._call(self.pew.emd_item_orders, 'a', 'all', types, region_ids=regions):
+					side = 'buy' if row.buysell == 'b' else 'sell'
+					orders.setdefault((int(row.typeID), int(row.regionID), side), []).append((float(row.price), float(row.volRemaining)))
+
+		for t in type_ids:
+			for r in region_ids:
+				self._books[(t, r)] = PewOrderBook(t, r, orders.get((t, r, 'buy')), orders.get((t, r, 'sell')))
+
+	def book(self, type_id, region_id):
+
+		return self._books.get((type_id, region_id))
+
+	def _call(self, method, *args, **kwargs):
+
+		self.calls += 1
+
+		return _rows(method(*args, **kwargs))
+
+	def _fetch_quotes(self, type_ids, region_ids):
+
+		expires = time.time() + self.ttl
+		fetched = {}
+
+		for types in _chunks(type_ids, self.batch_types):
+			if self.source == 'ecent':
+				# eve-central combines regions into one stat, so each region is its own call
+				for region in region_ids:
+					self.calls += 1
+					for stat in self.pew.ecent_market_stat(types, [region]):
+						fetched[(int(stat.id), region)] = {'buy': _stat_price(stat, 'buy', 'max'), 'sell': _stat_price(stat, 'sell', 'min')}
+				continue
+
+			for regions in _chunks(region_ids, self.batch_regions):
+				for row in self._call(self.pew.emd_item_prices, 'a', types, region_ids=regions):
+					side = 'buy' if row.buysell == 'b' else 'sell'
+					fetched.setdefault((int(row.typeID), int(row.regionID)), {'buy': None, 'sell': None})[side] = float(row.price)
+
+		for t in type_ids:
+			for r in region_ids:
+				# pairs with no market still get cached so they aren't re-requested every time
+				self._quotes[(t, r)] = (expires, fetched.get((t, r), {'buy': None, 'sell': None}))
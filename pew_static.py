@@ -0,0 +1,206 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_static - versioned static reference data cache for Pew (Python Eve Wrapper).
+#
+# eve_skill_tree, eve_certificate_tree, eve_reference_types and eve_error_list are
+# large and rarely change. PewStaticData keeps each one on disk as a single marshal
+# file holding the packed result plus prebuilt indexes, so a worker starts with one
+# marshal.loads per dataset instead of a download and a parse. A dataset is only
+# fetched again once its cachedUntil has passed or the caller's version changes, and
+# its indexes are only rebuilt when the fetched content actually differs.
+#
+# Usage:
+#
+#	static = PewStaticData(pew, '/var/cache/pew-static', version='YC118.3')
+#	static.skill(3300).typeName
+#	static.prerequisites(3300, recursive=True)
+#	static.ref_type_name(42)
+#
+#---------------------------------------------------------------------------------------
+
+import os
+import time
+import marshal
+import hashlib
+import tempfile
+
+from pew import PewError, pack_result, unpack_result
+
+def _rows(data, name):
+
+	return data.get(name) or []
+
+def _index_skills(data):
+
+	skills = {}
+	prerequisites = {}
+
+	for group in _rows(data, 'skillGroups'):
+		for skill in _rows(group, 'skills'):
+			skills[skill['typeID']] = skill
+			prerequisites[skill['typeID']] = [(required['typeID'], required['skillLevel']) for required in _rows(skill, 'requiredSkills')]
+
+	return {'skills': skills, 'prerequisites': prerequisites}
+
+def _index_certificates(data):
+
+	certificates = {}
+
+	for category in _rows(data, 'categories'):
+		for certificate_class in _rows(category, 'classes'):
+			for certificate in _rows(certificate_class, 'certificates'):
+				certificates[certificate['certificateID']] = certificate
+
+	return {'certificates': certificates}
+
+def _index_ref_types(data):
+
+	return {'names': dict((row['refTypeID'], row['refTypeName']) for row in _rows(data, 'refTypes'))}
+
+def _index_errors(data):
+
+	return {'texts': dict((row['errorCode'], row['errorText']) for row in _rows(data, 'errors'))}
+
+# dataset -> (endpoint, index builder working on pack_result() output)
+STATIC_DATASETS = {
+	'skills': ('eve_skill_tree', _index_skills),
+	'certificates': ('eve_certificate_tree', _index_certificates),
+	'ref_types': ('eve_reference_types', _index_ref_types),
+	'errors': ('eve_error_list', _index_errors),
+}
+
+class PewStaticData(object):
+	"""pew static data - on-disk, indexed copies of the static reference endpoints"""
+
+	def __init__(self, pew, path, version = None):
+
+		self.pew = pew
+		self.path = path
+		self.version = version
+		self.fetches = 0
+		self._datasets = {}
+
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+	def load(self, name, force = False):
+		"""Returns a dataset entry, reading it from disk or fetching it from the API as needed"""
+
+		entry = self._datasets.get(name) or self._read(name)
+
+		if force or entry is None or entry['version'] != self.version or entry['expires'] <= time.time():
+			entry = self._fetch(name, entry)
+
+		self._datasets[name] = entry
+
+		return entry
+
+	def refresh(self, force = False):
+
+		for name in sorted(STATIC_DATASETS):
+			self.load(name, force)
+
+	def index(self, name, index):
+
+		return self.load(name)['indexes'][index]
+
+	def result(self, name):
+		"""The whole dataset as PewApiObjects, as the endpoint method would return it"""
+
+		return unpack_result(self.load(name)['data'])
+
+	def skill(self, type_id):
+
+		skill = self.index('skills', 'skills').get(type_id)
+
+		return unpack_result(skill) if skill is not None else None
+
+	def prerequisites(self, type_id, recursive = False):
+		"""Required skills of a skill as a typeID -> level dict, optionally including their own requirements"""
+
+		graph = self.index('skills', 'prerequisites')
+		required = {}
+		pending = list(graph.get(type_id, []))
+
+		while len(pending) > 0:
+			required_id, level = pending.pop()
+
+			if required.get(required_id, -1) < level:
+				required[required_id] = level
+
+				if recursive:
+					pending.extend(graph.get(required_id, []))
+
+		return required
+
+	def certificate(self, certificate_id):
+
+		certificate = self.index('certificates', 'certificates').get(certificate_id)
+
+		return unpack_result(certificate) if certificate is not None else None
+
+	def ref_type_name(self, ref_type_id):
+
+		return self.index('ref_types', 'names').get(ref_type_id)
+
+	def error_text(self, code):
+
+		return self.index('errors', 'texts').get(code)
+
+	def _fetch(self, name, entry):
+
+		endpoint, build_index = STATIC_DATASETS[name]
+
+		try:
+			result = getattr(self.pew, endpoint)()
+		except PewError:
+			# an old copy beats no copy when the API is down
+			if entry is not None:
+				return entry
+			raise
+
+		self.fetches += 1
+
+		data = pack_result(result)
+		data.pop('_currentTime', None)
+		data.pop('_cachedUntil', None)
+		data.pop('_expires', None)
+		digest = hashlib.sha1(marshal.dumps(data)).hexdigest()
+
+		if entry is None or entry['digest'] != digest:
+			entry = {'data': data, 'digest': digest, 'indexes': build_index(data)}
+
+		entry['version'] = self.version
+		entry['expires'] = time.time() + self.pew.result_ttl(result)
+
+		self._write(name, entry)
+
+		return entry
+
+	def _file(self, name):
+
+		return os.path.join(self.path, '%s.dat' % name)
+
+	def _read(self, name):
+
+		try:
+			with open(self._file(name), 'rb') as f:
+				return marshal.load(f)
+		except (IOError, EOFError, ValueError, TypeError):
+			return None
+
+	def _write(self, name, entry):
+
+		fd, temp = tempfile.mkstemp(prefix='.tmp', dir=self.path)
+
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				marshal.dump(entry, f)
+
+			os.rename(temp, self._file(name))
+		except (IOError, OSError):
+			# the entry is still used from memory; the next process fetches its own copy
+			try:
+				os.remove(temp)
+			except OSError:
+				pass
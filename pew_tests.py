@@ -1,6 +1,23 @@
-import unittest, urllib, sys
-
-from pew import Pew, PewApiError, PewConnectionError
+import unittest, urllib, urllib2, urlparse, calendar, subprocess, sys, time, threading, os, tempfile, shutil, sqlite3, marshal, multiprocessing, gzip, zlib, mimetools, random
+
+from StringIO import StringIO
+
+import pew as pew_module
+from pew import Pew, PewEndpoint, PewParam, ENDPOINTS, ENDPOINTS_BY_NAME, PewPlanetGraph, PewErrorBudget, PewError, PewApiError, PewConnectionError, PewResponse, PewRowStream, PewCache, PewFileCache, pack_result, unpack_result
+import pew_export
+import pew_market
+import pew_load
+import pew_wallet
+from pew_export import PewCsvSink, PewSqliteSink, PewParquetSink, export_rowset
+from pew_market import PewMarket, PewOrderBook
+from pew_maps import PewMapStore
+from pew_static import PewStaticData
+from pew_mail import PewMailSync
+from pew_keys import PewKeyPool, PewKey, ACCESS_MASKS
+from pew_kills import PewKillStream
+from pew_load import PewSimulatedApi, run_load, parse_mix
+from pew_wallet import PewJournal, PewTransactions, ref_type_names
+from pew_bench import bench_startup
 
 import csv
 
@@ -523,6 +540,1289 @@ class Pew3rdPartyTests(PewTest):
 		result = self.pew.emd_item_orders('b','min','3465')
 		self.assertHasMember(result, 'orders')
 
+JOURNAL_XML = '<?xml version="1.0" encoding="UTF-8"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="transactions" key="refID" columns="refID,refTypeID,amount"><row refID="1" refTypeID="2" amount="10.5"/><row refID="2" refTypeID="42" amount="-3"/><row refID="3" refTypeID="2" amount="7"/></rowset></result><cachedUntil>2016-04-19 00:30:00</cachedUntil></eveapi>'
+
+class PewOfflinePew(Pew):
+	"""pew object that answers requests from canned XML instead of the network"""
+
+	def __init__(self, responses = None):
+		super(PewOfflinePew, self).__init__(1, 'test')
+
+		self.responses = responses or {}
+		self.urls = []
+
+	def _response_for(self, url):
+
+		self.urls.append(url)
+
+		for method_name, xml in self.responses.items():
+			if '/%s.' % method_name in url or '/%s?' % method_name in url:
+				return xml
+
+		raise PewConnectionError('no canned response for ' + url)
+
+	def _open(self, url):
+
+		return StringIO(self._response_for(url))
+
+def on_each_backend(module, func):
+	"""Calls func with module's NumPy code (where NumPy is installed), then with module.numpy set to None
+	OUTPUT: dict of 'numpy' / 'python' -> what func returned"""
+
+	results = {}
+	numpy = module.numpy
+
+	for backend in (['numpy'] if numpy is not None else []) + ['python']:
+		module.numpy = numpy if backend == 'numpy' else None
+
+		try:
+			results[backend] = func()
+		except AssertionError as er:
+			raise AssertionError('%s backend: %s' % (backend, er))
+		finally:
+			module.numpy = numpy
+
+	return results
+
+class PewExportTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'walletjournal': JOURNAL_XML})
+		self.path = tempfile.mktemp()
+
+	def tearDown(self):
+
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+	def test_row_stream_yields_rows_and_columns(self):
+
+		stream = PewRowStream(StringIO(JOURNAL_XML), parse_value=self.pew._parse_value)
+		rows = list(stream)
+
+		self.assertEqual(len(rows), 3)
+		self.assertEqual(rows[1]['refTypeID'], 42)
+		self.assertEqual(stream.name, 'transactions')
+		self.assertEqual(stream.columns, ['refID', 'refTypeID', 'amount'])
+		self.assertEqual((stream.currentTime, stream.cachedUntil), ('2016-04-19 00:00:00', '2016-04-19 00:30:00'))
+
+	def test_row_stream_raises_api_errors(self):
+
+		xml = '<?xml version="1.0"?><eveapi><error code="106">Bad</error></eveapi>'
+
+		self.assertRaises(PewApiError, list, PewRowStream(StringIO(xml)))
+
+	def test_iter_rows_streams_endpoint(self):
+
+		rows = list(self.pew.iter_rows('char_wallet_journal', 123))
+
+		self.assertEqual([row['refID'] for row in rows], [1, 2, 3])
+		self.assertEqual(self.pew._stream_rowset, None)
+
+	def test_csv_sink_writes_header_and_rows(self):
+
+		stats = export_rowset(self.pew, PewCsvSink(self.path, batch_size=2), 'char_wallet_journal', 123)
+
+		self.assertEqual(stats['rows'], 3)
+		self.assertEqual(stats['batches'], 2)
+		self.assertEqual(list(csv.reader(open(self.path))), [['refID', 'refTypeID', 'amount'], ['1', '2', '10.5'], ['2', '42', '-3'], ['3', '2', '7']])
+
+	def test_sqlite_sink_inserts_rows(self):
+
+		export_rowset(self.pew, PewSqliteSink(self.path, 'journal'), 'char_wallet_journal', 123)
+
+		conn = sqlite3.connect(self.path)
+		self.assertEqual(conn.execute('SELECT SUM(refTypeID) FROM journal').fetchone()[0], 46)
+		conn.close()
+
+	def test_parquet_column_types_widen(self):
+
+		self.assertEqual(pew_export._column_type(['100.50', '-1.50', -40]), 'float')
+		self.assertEqual(pew_export._column_type([1, '', None]), 'int')
+		self.assertEqual(pew_export._column_type(['', None]), None)
+		self.assertEqual(pew_export._cast(['100.50', -40, ''], 'float'), [100.5, -40.0, None])
+		self.assertEqual([pew_export._wider('int', 'float'), pew_export._wider('string', 'int'), pew_export._wider(None, 'float')], ['float', 'string', 'float'])
+
+	@unittest.skipIf(pew_export.pyarrow is None, 'pyarrow is not installed')
+	def test_parquet_sink_writes_mixed_batches(self):
+
+		self.pew.responses['walletjournal'] = WALLET_JOURNAL_XML
+		stats = export_rowset(self.pew, PewParquetSink(self.path, batch_size=2), 'char_wallet_journal', 123)
+
+		table = pew_export.pyarrow.parquet.read_table(self.path)
+		self.assertEqual(stats['batches'], 2)
+		self.assertEqual(table.column('amount').to_pylist(), [100.5, -1.5, -40.0, -9.0])
+		self.assertEqual(table.column('taxAmount').to_pylist(), [u'', u'', u'', u''])
+		self.assertEqual(table.column('refID').to_pylist(), [1, 2, 3, 4])
+
+	@unittest.skipIf(pew_export.pyarrow is None, 'pyarrow is not installed')
+	def test_parquet_sink_widens_columns_late_in_the_stream(self):
+
+		sink = PewParquetSink(self.path, columns=['id', 'value'], batch_size=2)
+		sink.write([{'id': 1, 'value': 1}, {'id': 2, 'value': ''}, {'id': 3, 'value': '2.5'}, {'id': 4, 'value': 'n/a'}])
+		sink.close()
+
+		table = pew_export.pyarrow.parquet.read_table(self.path)
+		self.assertEqual(table.column('id').to_pylist(), [1, 2, 3, 4])
+		self.assertEqual(table.column('value').to_pylist(), [u'1', u'', u'2.5', u'n/a'])
+
+	def test_export_closes_the_response(self):
+
+		responses = []
+		pew_open = self.pew._open
+
+		def opened(url):
+			responses.append(pew_open(url))
+			return responses[-1]
+
+		self.pew._open = opened
+		export_rowset(self.pew, PewCsvSink(self.path), 'char_wallet_journal', 123)
+
+		self.assertTrue(responses[0].closed)
+
+class PewCacheTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'walletjournal': JOURNAL_XML})
+		self.pew.cache = PewCache()
+
+	def test_pack_result_round_trips(self):
+
+		result = self.pew._parse_xml(JOURNAL_XML)
+		copy = unpack_result(marshal.loads(marshal.dumps(pack_result(result))))
+
+		self.assertEqual(copy.result.transactions[1].refTypeID, 42)
+		self.assertEqual(copy.cachedUntil, '2016-04-19 00:30:00')
+
+	def test_cache_serves_repeat_requests(self):
+
+		self.pew.char_wallet_journal(123)
+		result = self.pew.char_wallet_journal(123)
+
+		self.assertEqual(len(self.pew.urls), 1)
+		self.assertEqual(result.transactions[2].refID, 3)
+		self.assertEqual(self.pew.stats, {'cache_hits': 1, 'cache_misses': 1})
+
+	def test_cache_ttl_uses_server_times(self):
+
+		self.assertEqual(self.pew._cache_ttl(self.pew._parse_xml(JOURNAL_XML)), 1800)
+
+	def test_result_ttl_counts_down_on_cache_hits(self):
+
+		self.assertEqual(self.pew.result_ttl(self.pew.char_wallet_journal(123)), 1800)
+
+		# the document still says 1800 seconds, but only 100 are left on the entry
+		url = self.pew.urls[0]
+		self.pew.cache.set(url, self.pew.cache.get_entry(url)[1], 100)
+		ttl = self.pew.result_ttl(self.pew.char_wallet_journal(123))
+
+		self.assertEqual(len(self.pew.urls), 1)
+		self.assertTrue(0 < ttl <= 100)
+
+	def test_cache_drops_expired_entries(self):
+
+		self.pew.cache.set('a', [1], -1)
+
+		self.assertEqual(self.pew.cache.get('a'), None)
+
+	def test_expired_entries_are_pruned_unread(self):
+
+		cache = PewCache()
+
+		for i in range(5000):
+			cache.set('page:%d' % i, i, -1 if i < 4990 else 60)
+
+		self.assertTrue(len(cache._entries) < 1024)
+		self.assertEqual(cache.get('page:4999'), 4999)
+
+	def test_file_cache_round_trips(self):
+
+		path = tempfile.mkdtemp()
+
+		try:
+			PewFileCache(path).set('a', {'b': [1, 'c']}, 60)
+			self.assertEqual(PewFileCache(path).get('a'), {'b': [1, 'c']})
+		finally:
+			shutil.rmtree(path)
+
+	def test_file_cache_concurrent_writes_to_one_key(self):
+
+		path = tempfile.mkdtemp()
+		cache = PewFileCache(path)
+		errors = []
+
+		def write(n):
+			try:
+				for i in range(100):
+					cache.set('a', {'n': n, 'i': i}, 60)
+			except Exception as er:
+				errors.append(er)
+
+		try:
+			threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+			for thread in threads:
+				thread.start()
+			for thread in threads:
+				thread.join()
+
+			self.assertEqual(errors, [])
+			self.assertEqual(cache.get('a')['i'], 99)
+			self.assertEqual(len(os.listdir(path)), 1)
+		finally:
+			shutil.rmtree(path)
+
+class PewParsePoolTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pool = multiprocessing.Pool(1)
+		self.pew = PewOfflinePew({'walletjournal': JOURNAL_XML})
+		self.pew.parse_pool = self.pool
+
+	def tearDown(self):
+
+		self.pool.terminate()
+		self.pool.join()
+
+	def test_large_responses_parse_in_pool(self):
+
+		self.pew.parse_threshold = 0
+		result = self.pew.char_wallet_journal(123)
+
+		self.assertEqual(result.transactions[1].refTypeID, 42)
+		self.assertEqual(self.pew.stats['pool_parses'], 1)
+
+	def test_small_responses_parse_inline(self):
+
+		result = self.pew.char_wallet_journal(123)
+
+		self.assertEqual(result.transactions[1].refTypeID, 42)
+		self.assertFalse('pool_parses' in self.pew.stats)
+
+	def test_pool_errors_still_raise(self):
+
+		self.pew.parse_threshold = 0
+
+		self.assertRaises(PewApiError, self.pew._handle_result, '<?xml version="1.0"?><eveapi><error code="203">Auth</error></eveapi>')
+
+class PewStreamParseTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'walletjournal': JOURNAL_XML})
+		self.pew.stream_parse = True
+		self.pew.chunk_size = 16
+
+	def test_stream_parse_matches_buffered_parse(self):
+
+		result = self.pew.char_wallet_journal(123)
+
+		self.assertEqual([row.refTypeID for row in result.transactions], [2, 42, 2])
+		self.assertEqual(result.transactions[0].amount, '10.5')
+
+	def test_stream_parse_raises_api_errors(self):
+
+		self.pew.responses = {'walletjournal': '<?xml version="1.0"?><eveapi><error code="203">Auth</error></eveapi>'}
+
+		self.assertRaises(PewApiError, self.pew.char_wallet_journal, 123)
+
+	def test_stream_parse_fills_cache(self):
+
+		self.pew.cache = PewCache()
+		self.pew.char_wallet_journal(123)
+		self.pew.char_wallet_journal(123)
+
+		self.assertEqual(len(self.pew.urls), 1)
+
+class PewCompressionTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = Pew()
+
+	def response(self, body, encoding = None):
+
+		headers = mimetools.Message(StringIO('Content-Encoding: %s\n\n' % encoding if encoding else '\n'))
+
+		return PewResponse(urllib.addinfourl(StringIO(body), headers, 'http://localhost/'), self.pew._count)
+
+	def test_gzip_responses_are_decoded(self):
+
+		body = StringIO()
+		f = gzip.GzipFile(fileobj=body, mode='wb')
+		f.write(JOURNAL_XML)
+		f.close()
+
+		self.assertEqual(self.response(body.getvalue(), 'gzip').read(), JOURNAL_XML)
+		self.assertEqual(self.pew.stats['bytes_received'], len(body.getvalue()))
+		self.assertEqual(self.pew.stats['bytes_uncompressed'], len(JOURNAL_XML))
+
+	def test_zlib_and_raw_deflate_responses_are_decoded(self):
+
+		raw = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+		self.assertEqual(self.response(zlib.compress(JOURNAL_XML), 'deflate').read(), JOURNAL_XML)
+		self.assertEqual(self.response(raw.compress(JOURNAL_XML) + raw.flush(), 'deflate').read(), JOURNAL_XML)
+
+	def test_chunked_reads_feed_the_parser(self):
+
+		response = self.response(zlib.compress(JOURNAL_XML), 'deflate')
+		rows = list(PewRowStream(response))
+
+		self.assertEqual(len(rows), 3)
+
+	def test_plain_responses_pass_through(self):
+
+		response = self.response(JOURNAL_XML)
+
+		self.assertEqual(response.read(10) + response.read(), JOURNAL_XML)
+
+EMD_PRICES_XML = '<?xml version="1.0"?><emd version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="result" columns="buysell,typeID,regionID,price,updated"><row buysell="b" typeID="34" regionID="10000002" price="4.50" updated=""/><row buysell="s" typeID="34" regionID="10000002" price="4.91" updated=""/><row buysell="s" typeID="35" regionID="10000043" price="9.10" updated=""/></rowset></result></emd>'
+
+EMD_ORDERS_XML = '<?xml version="1.0"?><emd version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="orders" columns="buysell,typeID,regionID,price,volRemaining"><row buysell="b" typeID="34" regionID="10000002" price="4.50" volRemaining="100"/><row buysell="b" typeID="34" regionID="10000002" price="4.40" volRemaining="300"/><row buysell="s" typeID="34" regionID="10000002" price="5.00" volRemaining="10"/><row buysell="s" typeID="34" regionID="10000002" price="6.00" volRemaining="30"/></rowset></result></emd>'
+
+ECENT_XML = '<?xml version="1.0"?><evec_api version="2.0" method="marketstat_xml"><marketstat><type id="34"><buy><volume>10</volume><avg>4.4</avg><max>4.5</max><min>4.0</min></buy><sell><volume>5</volume><avg>5.1</avg><max>6.0</max><min>4.9</min></sell></type><type id="35"><buy><max>8.0</max></buy><sell><min>9.0</min></sell></type></marketstat></evec_api>'
+
+class PewMarketTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'item_prices2': EMD_PRICES_XML, 'item_orders2': EMD_ORDERS_XML, 'marketstat': ECENT_XML})
+
+	def test_quotes_batch_types_and_regions(self):
+
+		market = PewMarket(self.pew)
+		quotes = market.quotes([34, 35], [10000002, 10000043])
+
+		self.assertEqual(market.calls, 1)
+		self.assertEqual(quotes[(34, 10000002)], {'buy': 4.5, 'sell': 4.91})
+		self.assertEqual(quotes[(35, 10000043)], {'buy': None, 'sell': 9.1})
+		self.assertTrue('type_ids=34%2C35' in self.pew.urls[0])
+
+	def test_quotes_are_cached_until_ttl(self):
+
+		market = PewMarket(self.pew, ttl=60)
+		market.quotes([34], [10000002])
+		market.quote(34, 10000002)
+		self.assertEqual(market.calls, 1)
+
+		market.ttl = -1
+		market.quotes([35], [10000002])
+		market.quotes([35], [10000002])
+		self.assertEqual(market.calls, 3)
+
+	def test_quotes_from_eve_central(self):
+
+		market = PewMarket(self.pew, source='ecent')
+		quotes = market.quotes([34, 35], [10000002])
+
+		self.assertEqual(quotes[(35, 10000002)], {'buy': 8.0, 'sell': 9.0})
+		self.assertTrue('typeid=34&typeid=35' in self.pew.urls[0])
+
+	def test_eve_central_types_missing_a_side(self):
+
+		self.pew.responses['marketstat'] = '<?xml version="1.0"?><evec_api version="2.0" method="marketstat_xml"><marketstat><type id="34"><sell><min>4.9</min></sell></type><type id="35"><buy><max>8.0</max></buy><sell></sell></type></marketstat></evec_api>'
+		quotes = PewMarket(self.pew, source='ecent').quotes([34, 35], [10000002])
+
+		self.assertEqual(quotes[(34, 10000002)], {'buy': None, 'sell': 4.9})
+		self.assertEqual(quotes[(35, 10000002)], {'buy': 8.0, 'sell': None})
+
+	def test_only_stale_pairs_are_fetched(self):
+
+		market = PewMarket(self.pew, ttl=60)
+		market.quotes([34], [10000002])
+		market.quotes([35], [10000043])
+		self.pew.urls = []
+
+		market.quotes([34, 35], [10000002, 10000043])
+
+		queries = [urlparse.parse_qs(urlparse.urlparse(url).query) for url in self.pew.urls]
+
+		self.assertEqual(sorted((query['type_ids'][0], query['region_ids'][0]) for query in queries), [('34', '10000043'), ('35', '10000002')])
+
+	def test_order_book_index(self):
+
+		def check():
+			market = PewMarket(self.pew)
+			market.refresh_orders([34], [10000002])
+			book = market.book(34, 10000002)
+
+			self.assertEqual(book.best_bid(), 4.5)
+			self.assertEqual(book.best_ask(), 5.0)
+			self.assertEqual(book.volume('buy'), 400)
+			self.assertAlmostEqual(book.vwap('sell'), 5.75)
+
+		on_each_backend(pew_market, check)
+
+	def test_empty_order_book(self):
+
+		def check():
+			book = PewOrderBook(34, 10000002)
+
+			self.assertEqual(book.best_bid(), None)
+			self.assertEqual(book.volume('sell'), 0)
+			self.assertEqual(book.vwap('buy'), None)
+
+		on_each_backend(pew_market, check)
+
+	@unittest.skipIf(pew_market.numpy is None, 'numpy is not installed')
+	def test_numpy_and_python_books_agree(self):
+
+		chooser = random.Random(1)
+		orders = lambda count: [(round(chooser.uniform(1, 100), 2), chooser.randint(1, 1000)) for _ in range(count)]
+		books = [(orders(200), orders(300)), (orders(1), []), ([], [])]
+		report = lambda book: [book.best_bid(), book.best_ask(), book.volume('buy'), book.volume('sell'), book.vwap('buy') and round(book.vwap('buy'), 9), book.vwap('sell') and round(book.vwap('sell'), 9)]
+		results = on_each_backend(pew_market, lambda: [report(PewOrderBook(34, 10000002, bids, asks)) for bids, asks in books])
+
+		self.assertEqual(results['numpy'], results['python'])
+
+def map_xml(rows):
+
+	return '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="solarSystems" key="solarSystemID">%s</rowset><dataTime>2016-04-18 23:00:00</dataTime></result><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>' % rows
+
+class PewMapStoreTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({
+			'kills': map_xml('<row solarSystemID="30000142" shipKills="3" factionKills="1" podKills="2"/><row solarSystemID="30000001" shipKills="1" factionKills="0" podKills="0"/>'),
+			'sovereignty': map_xml('<row solarSystemID="30000001" allianceID="99000001" factionID="0" solarSystemName="Tanoo" corporationID="0"/>'),
+		})
+		self.store = PewMapStore(self.pew, history=3)
+
+	def test_refresh_indexes_by_system(self):
+
+		self.store.refresh(['kills', 'sovereignty'])
+
+		self.assertEqual(self.store.get('kills', 30000142, 'podKills'), 2)
+		self.assertEqual(self.store.get('kills', 30000002, 'podKills'), None)
+		self.assertEqual(self.store.get('sovereignty', 30000001, 'allianceID'), 99000001)
+		self.assertEqual(self.store.names[30000001], 'Tanoo')
+
+	def test_refreshing_the_same_data_stores_it_once(self):
+
+		self.store.refresh(['kills'])
+		self.store.refresh(['kills'])
+
+		self.assertEqual(len(self.store.snapshots('kills')), 1)
+		self.assertEqual(self.store.latest('kills').timestamp, calendar.timegm((2016, 4, 18, 23, 0, 0)))
+		self.assertEqual(self.store.total('kills', 30000142, 'shipKills'), 3)
+
+	def test_history_is_bounded_and_summed(self):
+
+		for hour in range(4):
+			self.store.add('kills', [{'solarSystemID': 30000142, 'shipKills': hour}], time.time() - (3 - hour) * 3600)
+
+		self.assertEqual(len(self.store.snapshots('kills')), 3)
+		self.assertEqual(self.store.total('kills', 30000142, 'shipKills'), 6)
+		self.assertEqual(self.store.total('kills', 30000142, 'shipKills', hours=1.5), 5)
+		self.assertEqual(self.store.total('kills', 30000143, 'shipKills'), 0)
+
+	def test_sov_changes(self):
+
+		self.store.add('sovereignty', [{'solarSystemID': 1, 'allianceID': 5, 'factionID': 0}, {'solarSystemID': 2, 'allianceID': 6, 'factionID': 0}])
+		self.store.add('sovereignty', [{'solarSystemID': 1, 'allianceID': 5, 'factionID': 0}, {'solarSystemID': 2, 'allianceID': 7, 'factionID': 0}])
+
+		changes = self.store.sov_changes()
+
+		self.assertEqual([(system_id, old['allianceID'], new['allianceID']) for timestamp, system_id, old, new in changes], [(2, 6, 7)])
+
+SKILL_TREE_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="skillGroups" key="groupID" columns="groupName,groupID"><row groupName="Spaceship Command" groupID="257"><rowset name="skills" key="typeID" columns="typeName,groupID,typeID"><row typeName="Spaceship Command" groupID="257" typeID="3327" published="1"><description>Ships</description><rank>1</rank><rowset name="requiredSkills" key="typeID" columns="typeID,skillLevel"/></row><row typeName="Amarr Frigate" groupID="257" typeID="3331" published="1"><rank>2</rank><rowset name="requiredSkills" key="typeID" columns="typeID,skillLevel"><row typeID="3327" skillLevel="1"/></rowset></row><row typeName="Amarr Destroyer" groupID="257" typeID="33091" published="1"><rank>2</rank><rowset name="requiredSkills" key="typeID" columns="typeID,skillLevel"><row typeID="3331" skillLevel="3"/></rowset></row></rowset></row></rowset></result><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>'
+
+REF_TYPES_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="refTypes" key="refTypeID" columns="refTypeID,refTypeName"><row refTypeID="2" refTypeName="Market Transaction"/><row refTypeID="42" refTypeName="Market Escrow"/></rowset></result><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>'
+
+class PewStaticDataTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.path = tempfile.mkdtemp()
+		self.pew = PewOfflinePew({'skilltree': SKILL_TREE_XML, 'reftypes': REF_TYPES_XML})
+
+	def tearDown(self):
+
+		shutil.rmtree(self.path)
+
+	def test_indexes_skills_and_prerequisites(self):
+
+		static = PewStaticData(self.pew, self.path)
+
+		self.assertEqual(static.skill(3331).typeName, 'Amarr Frigate')
+		self.assertEqual(static.prerequisites(33091), {3331: 3})
+		self.assertEqual(static.prerequisites(33091, recursive=True), {3331: 3, 3327: 1})
+		self.assertEqual(static.ref_type_name(42), 'Market Escrow')
+
+	def test_loads_from_disk_without_fetching(self):
+
+		PewStaticData(self.pew, self.path).load('skills')
+		static = PewStaticData(self.pew, self.path)
+
+		self.assertEqual(static.skill(3327).rank, 1)
+		self.assertEqual(static.fetches, 0)
+
+	def test_refetches_on_version_change(self):
+
+		PewStaticData(self.pew, self.path, version=1).load('ref_types')
+		static = PewStaticData(self.pew, self.path, version=2)
+
+		self.assertEqual(static.ref_type_name(2), 'Market Transaction')
+		self.assertEqual(static.fetches, 1)
+		self.assertEqual(len(self.pew.urls), 2)
+
+MAIL_HEADERS_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="messages" key="messageID" columns="messageID,senderID,sentDate,title"><row messageID="7" senderID="1" sentDate="2016-04-18 10:00:00" title="Second"/><row messageID="5" senderID="1" sentDate="2016-04-18 09:00:00" title="First"/><row messageID="9" senderID="2" sentDate="2016-04-18 11:00:00" title="Third"/></rowset></result><cachedUntil>2016-04-19 00:30:00</cachedUntil></eveapi>'
+
+MAIL_BODIES_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="messages" key="messageID" columns="messageID"><row messageID="5"><![CDATA[one]]></row><row messageID="7"><![CDATA[two]]></row></rowset><missingMessageIDs>9</missingMessageIDs></result><cachedUntil>2016-04-19 00:30:00</cachedUntil></eveapi>'
+
+class PewMailSyncTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'mailmessages': MAIL_HEADERS_XML, 'mailbodies': MAIL_BODIES_XML})
+		self.sync = PewMailSync(self.pew, batch_size=2)
+
+	def test_new_messages_fetch_bodies_in_batches(self):
+
+		messages = list(self.sync.new_messages(123))
+
+		self.assertEqual([(m.title, m.body) for m in messages], [('First', 'one'), ('Second', 'two')])
+		self.assertEqual(self.sync.calls, 3)
+		self.assertTrue('ids=5%2C7' in self.pew.urls[1])
+		self.assertTrue('ids=9' in self.pew.urls[2])
+
+	def test_known_messages_are_not_fetched_again(self):
+
+		list(self.sync.new_messages(123))
+		self.pew.urls = []
+
+		self.assertEqual(list(self.sync.new_messages(123)), [])
+		self.assertEqual(len(self.pew.urls), 2) # headers, then the still missing message 9
+		self.assertEqual(self.sync.body('mail', 123, 7), 'two')
+		self.assertEqual([m.title for m in self.sync.stored('mail', 123)], ['First', 'Second'])
+
+	def test_messages_are_stored_only_once_handled(self):
+
+		messages = self.sync.new_messages(123)
+		self.assertEqual(next(messages).title, 'First')
+		self.assertEqual(next(messages).title, 'Second')
+		messages.close()
+
+		self.assertEqual(self.sync.body('mail', 123, 5), 'one')
+		self.assertEqual(self.sync.body('mail', 123, 7), None)
+		self.assertEqual([m.title for m in self.sync.new_messages(123)], ['Second'])
+
+CONTRACTS_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="contractList" key="contractID" columns="contractID,type,status"><row contractID="11" type="ItemExchange" status="Outstanding"/><row contractID="12" type="Auction" status="Outstanding"/><row contractID="13" type="ItemExchange" status="Completed"/></rowset></result><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>'
+
+CONTRACT_BIDS_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="bidList" key="bidID" columns="bidID,contractID,amount"><row bidID="1" contractID="12" amount="100.00"/><row bidID="2" contractID="12" amount="150.00"/></rowset></result><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>'
+
+CONTRACT_ITEMS_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="itemList" key="recordID" columns="recordID,typeID,quantity"><row recordID="1" typeID="34" quantity="1000"/></rowset></result><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>'
+
+class PewContractTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'contracts': CONTRACTS_XML, 'contractBids': CONTRACT_BIDS_XML, 'contractItems': CONTRACT_ITEMS_XML})
+
+	def item_urls(self):
+
+		return [url for url in self.pew.urls if '/contractItems.' in url]
+
+	def test_hydrate_joins_items_and_bids(self):
+
+		contracts = self.pew.hydrate_contracts(123, threads=3)
+
+		self.assertEqual([c.contractID for c in contracts], [11, 12, 13])
+		self.assertEqual(contracts[0].items[0].typeID, 34)
+		self.assertEqual([b.bidID for b in contracts[1].bids], [1, 2])
+		self.assertEqual(contracts[2].bids, [])
+		self.assertEqual(sorted(url.split('contractID=')[1][:2] for url in self.item_urls()), ['11', '12', '13'])
+
+	def test_hydrate_only_fetches_uncached_items(self):
+
+		self.pew.hydrate_contracts(123)
+		self.pew.urls = []
+		contracts = self.pew.hydrate_contracts(123)
+
+		self.assertEqual(self.item_urls(), [])
+		self.assertEqual(contracts[1].items[0].quantity, 1000)
+		self.assertEqual(self.pew.stats['contract_items_cached'], 3)
+
+	def test_failed_item_lookups_leave_items_empty(self):
+
+		response_for = self.pew._response_for
+
+		def flaky(url):
+			if 'contractID=12' in url:
+				raise PewConnectionError('timed out')
+			return response_for(url)
+
+		self.pew._response_for = flaky
+		contracts = self.pew.hydrate_contracts(123, threads=3)
+
+		self.assertEqual([c.items is None for c in contracts], [False, True, False])
+		self.assertEqual(self.pew.stats['contract_item_errors'], 1)
+
+	def test_params_are_per_thread(self):
+
+		self.pew._params['a'] = 1
+		other = []
+		thread = threading.Thread(target=lambda: other.append(dict(self.pew._params)))
+		thread.start()
+		thread.join()
+
+		self.assertEqual(other, [{}])
+		self.assertEqual(self.pew._params, {'a': 1})
+
+def planet_xml(rowset, rows):
+
+	return '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="%s">%s</rowset></result><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>' % (rowset, rows)
+
+class PewPlanetTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({
+			'planetaryColonies': planet_xml('colonies', '<row planetID="40000001" planetName="A I"/><row planetID="40000002" planetName="A II"/>'),
+			'planetaryPins': planet_xml('pins', '<row pinID="1" typeID="2254" contentTypeID="0" contentQuantity="0"/><row pinID="2" typeID="2562" contentTypeID="2393" contentQuantity="40"/><row pinID="2" typeID="2562" contentTypeID="2396" contentQuantity="5"/>'),
+			'planetaryLinks': planet_xml('links', '<row sourcePinID="1" destinationPinID="2" linkLevel="0"/>'),
+			'PlanetaryRoutes': planet_xml('routes', '<row routeID="9" sourcePinID="2" destinationPinID="1" contentTypeID="2393" quantity="40"/>'),
+		})
+
+	def test_load_planets_builds_graphs(self):
+
+		graphs = self.pew.load_planets(123, threads=6)
+		graph = graphs[40000002]
+
+		self.assertIsInstance(graph, PewPlanetGraph)
+		self.assertEqual(sorted(graphs), [40000001, 40000002])
+		self.assertEqual(graph.colony.planetName, 'A II')
+		self.assertEqual(sorted(graph.pins), [1, 2])
+		self.assertEqual(graph.contents[2], [(2393, 40), (2396, 5)])
+		self.assertEqual(graph.neighbours(1), [2])
+		self.assertEqual(graph.routes_from(2)[0].routeID, 9)
+		self.assertEqual(graph.routes_to(2), [])
+		self.assertEqual(len(self.pew.urls), 7)
+
+	def test_load_planets_reuses_graphs_until_expiry(self):
+
+		self.pew.load_planets(123)
+		self.pew.load_planets(123)
+
+		self.assertEqual(len(self.pew.urls), 7)
+
+def key_info_xml(key_type, mask, character_ids):
+
+	rows = ''.join(['<row characterID="%d" characterName="C%d" corporationID="1000"/>' % (i, i) for i in character_ids])
+
+	return '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><key accessMask="%d" type="%s" expires=""><rowset name="characters" key="characterID">%s</rowset></key></result><cachedUntil>2016-04-19 00:05:00</cachedUntil></eveapi>' % (mask, key_type, rows)
+
+AUTH_ERROR_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><error code="203">Authentication failure.</error><cachedUntil>2016-04-20 00:00:00</cachedUntil></eveapi>'
+
+class PewKeyPoolTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pool = PewKeyPool(threads=2)
+		self.bad = self.add(1, {'APIKeyInfo': key_info_xml('Character', 2097152, [100]), 'walletjournal': AUTH_ERROR_XML})
+		self.good = self.add(2, {'APIKeyInfo': key_info_xml('Character', 2097152, [100]), 'walletjournal': JOURNAL_XML})
+		self.corp = self.add(3, {'APIKeyInfo': key_info_xml('Corporation', 1048576, [100])})
+
+	def add(self, api_id, responses):
+
+		key = PewKey(PewOfflinePew(responses))
+		key.pew.api_id = api_id
+		self.pool.keys.append(key)
+
+		return key
+
+	def test_routes_by_character_type_and_mask(self):
+
+		self.assertEqual(self.pool.keys_for('char_wallet_journal', 100), [self.bad, self.good])
+		self.assertEqual(self.pool.keys_for('corp_wallet_journal', 100), [self.corp])
+		self.assertEqual(self.pool.keys_for('char_asset_list', 100), [])
+		self.assertEqual(self.pool.keys_for('char_wallet_journal', 101), [])
+
+	def test_auth_errors_quarantine_and_fall_through(self):
+
+		result = self.pool.call('char_wallet_journal', 100)
+
+		self.assertEqual(len(result.transactions), 3)
+		self.assertFalse(self.bad.healthy())
+		self.assertEqual(self.pool.keys_for('char_wallet_journal', 100), [self.good])
+
+		self.pool.release(self.bad)
+		self.assertTrue(self.bad.healthy())
+
+	def test_call_level_auth_errors_only_block_that_call(self):
+
+		self.bad.pew.responses['walletjournal'] = AUTH_ERROR_XML.replace('203', '200').replace('Authentication failure.', 'Current security level not high enough.')
+		result = self.pool.call('char_wallet_journal', 100)
+
+		self.assertEqual(len(result.transactions), 3)
+		self.assertTrue(self.bad.healthy())
+		self.assertEqual(self.pool.keys_for('char_wallet_journal', 100), [self.good])
+		self.assertFalse(self.bad.blocked('char_wallet_journal', 101))
+		self.assertEqual(self.pool.health()[0]['blocked'], [('char_wallet_journal', 100)])
+
+		self.pool.release(self.bad)
+		self.assertEqual(self.pool.keys_for('char_wallet_journal', 100), [self.bad, self.good])
+
+	def test_key_info_is_cached(self):
+
+		self.pool.keys_for('char_wallet_journal', 100)
+		self.pool.keys_for('char_wallet_journal', 100)
+
+		self.assertEqual(len(self.good.pew.urls), 1)
+		self.assertTrue('/account/APIKeyInfo.' in self.good.pew.urls[0])
+
+	def test_from_csv(self):
+
+		path = tempfile.mktemp()
+
+		try:
+			with open(path, 'wb') as f:
+				f.write("123,'abc',main\n456,def,alt\n")
+			pool = PewKeyPool.from_csv(path)
+		finally:
+			os.remove(path)
+
+		self.assertEqual([(k.pew.api_id, k.pew.api_key, k.pew.api_nickname) for k in pool.keys], [('123', 'abc', 'main'), ('456', 'def', 'alt')])
+
+	def test_http_error_documents_raise_api_errors(self):
+
+		def forbidden(request):
+			raise urllib2.HTTPError(request.get_full_url(), 403, 'Forbidden', mimetools.Message(StringIO('Content-Type: application/xml\n\n')), StringIO(AUTH_ERROR_XML))
+
+		urlopen = pew_module.urlopen
+		pew_module.urlopen = forbidden
+
+		try:
+			Pew(1, 'test').char_wallet_journal(100)
+			self.assertTrue(False)
+		except PewApiError as er:
+			self.assertEqual(er.code, 203)
+		finally:
+			pew_module.urlopen = urlopen
+
+class PewErrorHandlingTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'walletjournal': AUTH_ERROR_XML, 'accountStatus': '<?xml version="1.0"?><eveapi version="2"><error code="904">Blocked</error></eveapi>'})
+		self.pew.error_budget = PewErrorBudget(limit=4, window=60, slowdown=0.5, max_delay=2.0)
+
+	def test_errors_are_cached_until_cached_until(self):
+
+		self.assertRaises(PewApiError, self.pew.char_wallet_journal, 100)
+		self.assertRaises(PewApiError, self.pew.char_wallet_journal, 100)
+
+		self.assertEqual(len(self.pew.urls), 1)
+		self.assertEqual(self.pew.stats['error_cache_hits'], 1)
+		self.assertEqual(self.pew.error_budget.used(), 0.25)
+
+	def test_error_caching_can_be_turned_off(self):
+
+		self.pew.cache_errors = False
+		self.assertRaises(PewApiError, self.pew.char_wallet_journal, 100)
+		self.assertRaises(PewApiError, self.pew.char_wallet_journal, 100)
+
+		self.assertEqual(len(self.pew.urls), 2)
+
+	def test_errors_without_cached_until_use_class_ttl(self):
+
+		self.pew.error_ttls = {9: 0}
+		self.assertRaises(PewApiError, self.pew.acct_status)
+		self.assertRaises(PewApiError, self.pew.acct_status)
+
+		self.assertEqual(len(self.pew.urls), 2)
+
+	def test_errors_are_classified(self):
+
+		self.assertFalse(PewApiError(203, 'Authentication failure.').retryable)
+		self.assertFalse(PewApiError(106, 'Must provide userID parameter.').retryable)
+		self.assertTrue(PewApiError(520, 'Unexpected failure.').retryable)
+		self.assertTrue(PewApiError(904, 'Your IP address has been temporarily blocked.').retryable)
+		self.assertTrue(PewApiError(101, 'Wallet exhausted: retry after 2016-04-19 01:00:00.').retryable)
+		self.assertTrue(PewApiError(119, 'Kills exhausted: retry after 2016-04-19 01:00:00.').retryable)
+		self.assertTrue(PewApiError(123, 'Server busy, please try again later.').retryable)
+		self.assertFalse(PewApiError(121, 'Invalid beforeKillID provided.').retryable)
+
+	def test_error_codes_read_the_error_text(self):
+
+		rows = '<row errorCode="103" errorText="Already returned one week of data: retry after {0}."/><row errorCode="125" errorText="Please temporarily back off."/><row errorCode="203" errorText="Authentication failure."/><row errorCode="520" errorText="Unexpected failure accessing database."/>'
+		self.pew.responses['errorlist'] = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="errors" key="errorCode" columns="errorCode,errorText">%s</rowset></result><cachedUntil>2016-04-20 00:00:00</cachedUntil></eveapi>' % rows
+		codes = self.pew.error_codes()
+
+		self.assertEqual(dict((code, retryable) for code, (text, retryable) in codes.items()), {103: True, 125: True, 203: False, 520: True})
+		self.assertEqual(codes[203][0], 'Authentication failure.')
+
+	def test_error_budget_slows_down_near_the_limit(self):
+
+		budget = PewErrorBudget(limit=4, window=60, slowdown=0.5, max_delay=2.0)
+
+		budget.record(100)
+		budget.record(100)
+		self.assertEqual(budget.delay(110), 0)
+
+		budget.record(110)
+		self.assertEqual(budget.delay(110), 1.0)
+
+		budget.record(110)
+		self.assertEqual(budget.delay(130), 30)
+		self.assertEqual(budget.delay(161), 0)
+
+SERVER_STATUS_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><serverOpen>True</serverOpen><onlinePlayers>25000</onlinePlayers></result><cachedUntil>2016-04-19 00:03:00</cachedUntil></eveapi>'
+
+class PewSlowPew(PewOfflinePew):
+	"""offline pew object whose responses take a scripted number of seconds each"""
+
+	def __init__(self, responses = None, delays = None):
+		super(PewSlowPew, self).__init__(responses)
+
+		self.delays = list(delays or [])
+		self._delays_lock = threading.Lock()
+
+	def _open(self, url):
+
+		with self._delays_lock:
+			delay = self.delays.pop(0) if len(self.delays) > 0 else 0
+
+		time.sleep(delay)
+
+		return super(PewSlowPew, self)._open(url)
+
+class PewHedgingTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.responses = {'serverstatus': SERVER_STATUS_XML, 'killLog': SERVER_STATUS_XML}
+
+	def test_slow_requests_are_hedged(self):
+
+		pew = PewSlowPew(self.responses, [1.0, 0])
+		pew.hedging = True
+		pew.hedge_after = 0.05
+
+		start = time.time()
+		result = pew.misc_server_status()
+
+		self.assertTrue(time.time() - start < 0.5)
+		self.assertEqual(result.onlinePlayers, 25000)
+		self.assertEqual(pew.stats['hedges_fired'], 1)
+		self.assertEqual(pew.stats['hedges_won'], 1)
+
+	def test_fast_requests_are_not_hedged(self):
+
+		pew = PewSlowPew(self.responses)
+		pew.hedging = True
+
+		pew.misc_server_status()
+
+		self.assertEqual(len(pew.urls), 1)
+		self.assertTrue('hedges_fired' not in pew.stats)
+
+	def test_only_flagged_endpoints_are_hedged(self):
+
+		pew = PewSlowPew(self.responses, [0.2, 0])
+		pew.hedging = True
+		pew.hedge_after = 0.05
+
+		pew.char_kill_log(100)
+		self.assertTrue('hedges_fired' not in pew.stats)
+
+		pew.delays = [0.2, 0]
+		pew.call('char_kill_log', 100, hedge=True)
+		self.assertEqual(pew.stats['hedges_fired'], 1)
+
+	def test_hedge_delay_follows_the_latency_percentile(self):
+
+		pew = PewOfflinePew()
+		pew.hedge_samples = 10
+
+		for i in range(1, 11):
+			pew._record_latency(('server', 'serverstatus'), i / 10.0)
+
+		self.assertEqual(pew._hedge_delay(('server', 'serverstatus')), 1.0)
+		self.assertEqual(pew._hedge_delay(('char', 'killLog')), pew.hedge_after)
+
+		pew.hedge_percentile = 50
+		self.assertEqual(pew._hedge_delay(('server', 'serverstatus')), 0.6)
+
+	def test_deadlines(self):
+
+		pew = PewSlowPew(self.responses, [0.5])
+
+		self.assertRaises(PewConnectionError, pew.call, 'misc_server_status', deadline=0.05)
+		self.assertEqual(pew.stats['deadlines_exceeded'], 1)
+
+		self.assertEqual(pew.call('misc_server_status', deadline=1.0).onlinePlayers, 25000)
+		self.assertEqual(pew._call_options, {})
+
+class PewRegistryTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'killLog': '<?xml version="1.0"?><eveapi version="2"><result><rowset name="kills" key="killID" columns="killID"/></result></eveapi>'})
+
+	def test_every_endpoint_is_a_method(self):
+
+		for endpoint in ENDPOINTS:
+			method = getattr(Pew, endpoint.name)
+			self.assertEqual(method.endpoint, endpoint)
+			self.assertEqual(method.__name__, endpoint.name)
+			self.assertTrue(method.__doc__)
+
+		self.assertEqual(len(ENDPOINTS_BY_NAME), len(ENDPOINTS))
+
+	def test_urls_are_built_from_the_registry(self):
+
+		self.pew.char_kill_log(100)
+		self.assertEqual(self.pew.urls[-1], 'https://api.eveonline.com/char/killLog.xml.aspx?' + urllib.urlencode({'characterId': 100, 'keyId': 1, 'vCode': 'test'}, True))
+
+		self.assertEqual(self.pew._url_prefixes[(self.pew.api_url, 'char', 'killLog')], 'https://api.eveonline.com/char/killLog.xml.aspx')
+
+	def test_params_are_bound_like_a_method_signature(self):
+
+		endpoint = ENDPOINTS_BY_NAME['char_contracts']
+
+		self.assertEqual(endpoint.bind((100,), {}), (100, []))
+		self.assertEqual(endpoint.bind((100, 5), {}), (100, [('contractID', '5')]))
+		self.assertEqual(ENDPOINTS_BY_NAME['eve_character_id'].bind((['a', 'b'],), {}), (None, [('names', 'a,b')]))
+		self.assertEqual(ENDPOINTS_BY_NAME['char_asset_list'].bind((), {'character_id': 100}), (100, [('flat', '0')]))
+
+		self.assertRaises(TypeError, self.pew.char_contract_items, 100)
+		self.assertRaises(TypeError, self.pew.char_skill_queue, 100, 200)
+		self.assertRaises(TypeError, self.pew.char_skill_queue, 100, character_id=100)
+		self.assertRaises(TypeError, self.pew.char_skill_queue, 100, bogus=1)
+
+	def test_uncached_endpoints_skip_the_cache(self):
+
+		self.pew.cache = PewCache()
+		self.pew.responses['item_prices2'] = '<?xml version="1.0"?><emd version="2"><result><rowset name="rows"/></result></emd>'
+
+		self.pew.emd_item_prices('a', [34])
+		self.pew.emd_item_prices('a', [34])
+
+		self.assertEqual(len(self.pew.urls), 2)
+		self.assertEqual(self.pew.stats.get('cache_misses', 0), 0)
+
+	def test_access_masks_come_from_the_registry(self):
+
+		self.assertEqual(ACCESS_MASKS['char_wallet_journal'], 2097152)
+		self.assertEqual(ACCESS_MASKS['corp_pos_detail'], 131072)
+		self.assertTrue('eve_skill_tree' not in ACCESS_MASKS)
+
+def kill_log_xml(kill_ids):
+
+	rows = ''.join('<row killID="%d" solarSystemID="30000142" killTime="2016-04-18 10:00:00" moonID="0"><victim characterID="1" shipTypeID="587" damageTaken="500"/><rowset name="attackers" columns="characterID,damageDone,finalBlow"><row characterID="2" damageDone="500" finalBlow="1"/></rowset><rowset name="items" columns="typeID,flag,qtyDropped,qtyDestroyed"><row typeID="34" flag="5" qtyDropped="100" qtyDestroyed="0"/></rowset></row>' % kill_id for kill_id in kill_ids)
+
+	return '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="kills" key="killID" columns="killID,solarSystemID,killTime,moonID">%s</rowset></result><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>' % rows
+
+class PewKillLogPew(PewOfflinePew):
+	"""offline pew object serving a kill log in pages of page_size, newest first"""
+
+	def __init__(self, kill_ids, page_size = 3):
+		super(PewKillLogPew, self).__init__()
+
+		self.kill_ids = sorted(kill_ids, reverse=True)
+		self.page_size = page_size
+
+	def _response_for(self, url):
+
+		self.urls.append(url)
+		before = urlparse.parse_qs(urlparse.urlparse(url).query).get('beforeKillID')
+		kill_ids = [kill_id for kill_id in self.kill_ids if before is None or kill_id < int(before[0])]
+
+		if before is not None and len(kill_ids) == 0:
+			return '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><error code="119">Kills exhausted: retry after [2016-04-19 01:00:00]</error><cachedUntil>2016-04-19 01:00:00</cachedUntil></eveapi>'
+
+		return kill_log_xml(kill_ids[:self.page_size])
+
+class PewKillStreamTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.kills = PewKillStream()
+
+	def test_pages_backwards_until_exhausted(self):
+
+		pew = PewKillLogPew(range(1, 8))
+		kills = list(self.kills.new_kills(pew, 100))
+
+		self.assertEqual([kill.killID for kill in kills], [7, 6, 5, 4, 3, 2, 1])
+		self.assertEqual(len(pew.urls), 4)
+		self.assertTrue('beforeKillID=5' in pew.urls[1])
+		self.assertEqual(kills[0].attackers[0].finalBlow, 1)
+		self.assertEqual(kills[0].items[0].typeID, 34)
+		self.assertEqual(kills[0].victim.shipTypeID, 587)
+
+	def test_stops_at_known_kills(self):
+
+		list(self.kills.new_kills(PewKillLogPew(range(1, 8)), 100))
+
+		pew = PewKillLogPew(range(1, 12))
+		kills = list(self.kills.new_kills(pew, 100))
+
+		self.assertEqual([kill.killID for kill in kills], [11, 10, 9, 8])
+		self.assertEqual(len(pew.urls), 2)
+		self.assertEqual(len(self.kills), 11)
+		self.assertEqual(self.kills.high_water('1:char:100'), 11)
+
+	def test_kills_are_shared_across_keys(self):
+
+		list(self.kills.new_kills(PewKillLogPew([1, 2, 3, 5]), 100))
+		kills = list(self.kills.new_kills(PewKillLogPew([2, 3, 4]), 200, corp=True))
+
+		self.assertEqual([kill.killID for kill in kills], [4])
+		self.assertTrue(self.kills.seen(4))
+		self.assertFalse(self.kills.seen(6))
+
+	def test_second_key_pages_past_kills_the_first_key_saw(self):
+
+		list(self.kills.new_kills(PewKillLogPew([3, 4, 5]), 100))
+		kills = list(self.kills.new_kills(PewKillLogPew(range(1, 6)), 200, corp=True))
+
+		self.assertEqual([kill.killID for kill in kills], [2, 1])
+
+	def test_kills_are_seen_only_once_handled(self):
+
+		stream = self.kills.new_kills(PewKillLogPew(range(1, 7)), 100)
+		self.assertEqual(next(stream).killID, 6)
+		stream.close()
+
+		self.assertFalse(self.kills.seen(5))
+		self.assertEqual([kill.killID for kill in self.kills.new_kills(PewKillLogPew(range(1, 7)), 100)], [6, 5, 4, 3, 2, 1])
+		self.assertEqual(self.kills.high_water('1:char:100'), 6)
+
+class PewLoadTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.api = PewSimulatedApi(latency=0, rows={'char_wallet_journal': 20}, seed=1).start()
+
+	def tearDown(self):
+
+		self.api.stop()
+
+	def test_simulated_api_answers_registry_endpoints(self):
+
+		pew = Pew(1, 'test')
+		pew.api_url = self.api.url
+
+		self.assertEqual(len(pew.char_wallet_journal(100).transactions), 20)
+		self.assertTrue(pew.result_ttl(pew.misc_server_status()) > 0)
+
+	def test_run_load_reports_every_call(self):
+
+		report = run_load(self.api.url, parse_mix('char_wallet_journal:3,misc_server_status'), workers=2, calls=10)
+
+		self.assertEqual(report['calls'], 20)
+		self.assertEqual(report['errors'], 0)
+		self.assertEqual(sum(self.api.requests.values()), 20)
+		self.assertEqual(sum(stats['count'] for stats in report['endpoints'].values()), 20)
+		self.assertTrue(report['latency']['p50'] <= report['latency']['p99'] <= report['latency']['max'])
+		self.assertEqual(len(report['per_worker']), 2)
+
+	def test_error_rate(self):
+
+		self.api.error_rate = 1.0
+		report = run_load(self.api.url, {'misc_server_status': 1}, workers=1, calls=3)
+
+		self.assertEqual(report['errors'], 3)
+		self.assertEqual(sum(self.api.requests.values()), 3)
+
+	def test_mix_is_limited_to_simulated_endpoints(self):
+
+		self.assertEqual(parse_mix('char_wallet_journal:3,misc_server_status'), {'char_wallet_journal': 3.0, 'misc_server_status': 1.0})
+		self.assertRaises(PewError, parse_mix, 'char_wallet_journal,emd_item_prices')
+		self.assertRaises(PewError, parse_mix, 'char_no_such_thing')
+
+	def test_failed_thread_workers_fail_the_run(self):
+
+		def fail(job):
+			raise ValueError('worker %d died' % job[0])
+
+		worker = pew_load._worker
+		pew_load._worker = fail
+
+		try:
+			self.assertRaises(ValueError, run_load, self.api.url, {'misc_server_status': 1}, workers=2, calls=1)
+		finally:
+			pew_load._worker = worker
+
+	def test_runs_without_the_resource_module(self):
+
+		resource = pew_load.resource
+		pew_load.resource = None
+
+		try:
+			report = run_load(self.api.url, {'misc_server_status': 1}, workers=1, calls=2)
+		finally:
+			pew_load.resource = resource
+
+		self.assertEqual(report['calls'], 2)
+		self.assertEqual(report['per_worker'][0]['max_rss_kb'], None)
+		self.assertTrue(report['per_worker'][0]['cpu'] >= 0)
+
+WALLET_JOURNAL_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="transactions" key="refID" columns="date,refID,refTypeID,ownerID1,ownerID2,amount,balance,taxAmount"><row date="2016-04-15 10:00:00" refID="1" refTypeID="2" ownerID1="1" ownerID2="2" amount="100.50" balance="100.50" taxAmount=""/><row date="2016-04-15 10:00:00" refID="2" refTypeID="54" ownerID1="1" ownerID2="2" amount="-1.50" balance="99.00" taxAmount=""/><row date="2016-04-16 12:30:00" refID="3" refTypeID="2" ownerID1="1" ownerID2="2" amount="-40" balance="59.00" taxAmount=""/><row date="2016-04-18 23:59:59" refID="4" refTypeID="42" ownerID1="1" ownerID2="2" amount="-9" balance="50.00" taxAmount=""/></rowset></result><cachedUntil>2016-04-19 00:30:00</cachedUntil></eveapi>'
+
+WALLET_TRANSACTIONS_XML = '<?xml version="1.0"?><eveapi version="2"><currentTime>2016-04-19 00:00:00</currentTime><result><rowset name="transactions" key="transactionID" columns="transactionDateTime,transactionID,quantity,typeName,typeID,price,transactionType"><row transactionDateTime="2016-04-15 10:00:00" transactionID="1" quantity="10" typeName="Tritanium" typeID="34" price="5.00" transactionType="buy"/><row transactionDateTime="2016-04-15 11:00:00" transactionID="2" quantity="10" typeName="Tritanium" typeID="34" price="6.00" transactionType="buy"/><row transactionDateTime="2016-04-16 10:00:00" transactionID="3" quantity="15" typeName="Tritanium" typeID="34" price="8.00" transactionType="sell"/><row transactionDateTime="2016-04-14 10:00:00" transactionID="4" quantity="3" typeName="Pyerite" typeID="35" price="9.00" transactionType="sell"/><row transactionDateTime="2016-04-15 10:00:00" transactionID="5" quantity="2" typeName="Pyerite" typeID="35" price="4.00" transactionType="buy"/><row transactionDateTime="2016-04-16 10:00:00" transactionID="6" quantity="5" typeName="Pyerite" typeID="35" price="10.00" transactionType="sell"/></rowset></result><cachedUntil>2016-04-19 00:30:00</cachedUntil></eveapi>'
+
+class PewWalletTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'walletjournal': WALLET_JOURNAL_XML, 'wallettransactions': WALLET_TRANSACTIONS_XML, 'reftypes': REF_TYPES_XML})
+
+	def test_journal_totals_and_names(self):
+
+		def check():
+			journal = PewJournal(self.pew.iter_rows('char_wallet_journal', 100))
+			totals = journal.totals_by('refTypeID')
+
+			self.assertEqual(len(journal), 4)
+			self.assertAlmostEqual(totals[2], 60.5)
+			self.assertEqual(journal.named(totals, ref_type_names(self.pew))['Market Escrow'], -9)
+			self.assertEqual(journal.totals_by('refTypeID', positive=True), {2: 100.5})
+			self.assertEqual(journal.fees(), {'broker_fees': 0.0, 'transaction_tax': 1.5})
+
+		on_each_backend(pew_wallet, check)
+
+	def test_journal_daily_and_rolling_totals(self):
+
+		def check():
+			journal = PewJournal(self.pew.char_wallet_journal(100).transactions)
+			days, totals = journal.daily()
+			days, rolling = journal.rolling_daily(2)
+
+			self.assertEqual(list(days), [calendar.timegm((2016, 4, day, 0, 0, 0)) for day in (15, 16, 17, 18)])
+			self.assertEqual(list(totals), [99.0, -40.0, 0.0, -9.0])
+			self.assertEqual(list(rolling), [99.0, 59.0, -40.0, -9.0])
+			self.assertEqual(list(journal.daily([42])[1]), [-9.0])
+
+		on_each_backend(pew_wallet, check)
+
+	def test_fifo_profit(self):
+
+		def check():
+			transactions = PewTransactions(self.pew.char_wallet_transactions(100).transactions)
+			profit = transactions.fifo_profit()
+
+			# 10 @ 5 and 5 @ 6 sold at 8
+			self.assertEqual(profit[34], {'profit': 40.0, 'matched': 15, 'unmatched': 0})
+			# the first sale predates any purchase; the second uses the one purchase
+			self.assertEqual(profit[35], {'profit': 12.0, 'matched': 2, 'unmatched': 6})
+			self.assertEqual(transactions.totals_by('typeID', buy=True), {34: 110.0, 35: 8.0})
+
+		on_each_backend(pew_wallet, check)
+
+	def reports(self, journal_rows, transaction_rows):
+
+		journal = PewJournal(journal_rows)
+		transactions = PewTransactions(transaction_rows)
+		plain = lambda series: ([int(day) for day in series[0]], [round(total, 6) for total in series[1]])
+		rounded = lambda totals: dict((key, round(value, 6)) for key, value in totals.items())
+
+		return {
+			'totals_by': rounded(journal.totals_by('refTypeID')),
+			'outflow_by_owner': rounded(journal.totals_by('ownerID1', positive=False)),
+			'daily': plain(journal.daily()),
+			'daily_ref_types': plain(journal.daily([2, 42])),
+			'rolling_daily': plain(journal.rolling_daily(3)),
+			'fees': rounded(journal.fees()),
+			'transaction_totals': rounded(transactions.totals_by('typeID', buy=False)),
+			'transaction_daily': plain(transactions.daily(buy=True)),
+			'fifo_profit': dict((int(type_id), dict((name, round(value, 6)) for name, value in result.items())) for type_id, result in transactions.fifo_profit().items()),
+		}
+
+	@unittest.skipIf(pew_wallet.numpy is None, 'numpy is not installed')
+	def test_numpy_and_python_reports_agree(self):
+
+		chooser = random.Random(1)
+		stamp = lambda: time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(1460000000 + chooser.randint(0, 20 * 86400)))
+		journal_rows = [{'date': stamp(), 'refID': i, 'refTypeID': chooser.choice([1, 2, 42, 46, 54]), 'ownerID1': chooser.randint(1, 5), 'ownerID2': chooser.randint(1, 5), 'amount': round(chooser.uniform(-1000, 1000), 2), 'taxAmount': chooser.choice(['', 0, round(chooser.uniform(0, 10), 2)])} for i in range(500)]
+		transaction_rows = [{'transactionDateTime': stamp(), 'transactionID': i, 'typeID': chooser.randint(30, 40), 'quantity': chooser.randint(1, 50), 'price': round(chooser.uniform(1, 100), 2), 'transactionType': chooser.choice(['buy', 'sell'])} for i in range(500)]
+
+		for journal, transactions in [(journal_rows, transaction_rows), (self.pew.char_wallet_journal(100).transactions, self.pew.char_wallet_transactions(100).transactions)]:
+			results = on_each_backend(pew_wallet, lambda: self.reports(journal, transactions))
+
+			self.assertEqual(results['numpy'], results['python'])
+
+class PewMemoryBudgetTests(unittest.TestCase):
+
+	def setUp(self):
+
+		self.pew = PewOfflinePew({'walletjournal': WALLET_JOURNAL_XML, 'skilltree': SKILL_TREE_XML})
+		self.path = tempfile.mkdtemp()
+
+	def tearDown(self):
+
+		shutil.rmtree(self.path)
+
+	def test_incremental_parse_matches_tree_parse(self):
+
+		for xml in (WALLET_JOURNAL_XML, SKILL_TREE_XML, MAIL_BODIES_XML, kill_log_xml([1, 2])):
+			self.assertEqual(pack_result(self.pew._iterparse_xml(StringIO(xml))), pack_result(self.pew._parse_xml(xml)))
+
+	def test_large_responses_are_spooled(self):
+
+		expected = pack_result(self.pew.eve_skill_tree())
+
+		self.pew.memory_budget = 100
+		self.pew.spool_dir = self.path
+		result = self.pew.eve_skill_tree()
+
+		self.assertEqual(pack_result(result), expected)
+		self.assertEqual(self.pew.stats['spooled_responses'], 1)
+		self.assertEqual(self.pew.stats['spooled_bytes'], len(SKILL_TREE_XML))
+		self.assertEqual(os.listdir(self.path), [])
+
+		stats = self.pew.memory_stats[-1]
+		self.assertTrue(stats['spooled'])
+		self.assertEqual(stats['bytes'], len(SKILL_TREE_XML))
+		self.assertTrue(stats['max_rss_kb'] > 0)
+		self.assertTrue(stats['new_peak_kb'] >= 0)
+
+	def test_small_responses_stay_in_memory(self):
+
+		self.pew.memory_budget = 1048576
+		self.pew.char_wallet_journal(100)
+
+		self.assertFalse(self.pew.memory_stats[-1]['spooled'])
+		self.assertTrue('spooled_responses' not in self.pew.stats)
+
+class PewStartupTests(unittest.TestCase):
+
+	def test_import_leaves_heavy_modules_unloaded(self):
+
+		script = 'import sys, pew; print " ".join(sorted(m for m in ("urllib", "urllib2", "xml.etree.ElementTree", "multiprocessing", "tempfile", "hashlib", "msgpack", "resource") if m in sys.modules))'
+		loaded = subprocess.check_output([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)))
+
+		self.assertEqual(loaded.strip(), '')
+
+	def test_urlencode_matches_urllib(self):
+
+		params = {'keyId': 1, 'vCode': 'a b/c&d', 'ids': [1, 2], 'names': 'x,y', 'flat': 0}
+
+		self.assertEqual(pew_module._urlencode(params), urllib.urlencode(params, True))
+		self.assertEqual(pew_module._urlencode({'names': u'caf\xe9'}), 'names=caf%C3%A9')
+
+	def test_repr_uses_a_cached_pattern(self):
+
+		obj = unpack_result({'typeID': 1, 'name': 2, '_value': 3, '__x': 4})
+
+		self.assertEqual(repr(obj), "PEW API Object: ['name', 'typeID']")
+		pattern = pew_module._public_name
+		repr(obj)
+		self.assertTrue(pew_module._public_name is pattern)
+
+	def test_startup_benchmark(self):
+
+		startup = bench_startup(1)
+
+		self.assertEqual(sorted(startup), ['construct', 'first_call', 'import', 'modules', 'second_call'])
+		self.assertTrue(startup['import'] > 0)
+
 if __name__ == "__main__":
 
 	loader = unittest.TestLoader()
@@ -530,6 +1830,15 @@ if __name__ == "__main__":
 	suite = None
 	tests = None
 
+	# these don't need .eve_apis or network access
+	offline = [
+		PewExportTests, PewCacheTests, PewParsePoolTests, PewStreamParseTests, PewCompressionTests,
+		PewMarketTests, PewMapStoreTests, PewStaticDataTests, PewMailSyncTests, PewContractTests,
+		PewPlanetTests, PewKeyPoolTests, PewErrorHandlingTests, PewRegistryTests,
+		PewHedgingTests, PewKillStreamTests, PewLoadTests, PewWalletTests,
+		PewMemoryBudgetTests, PewStartupTests,
+	]
+
 	if len(sys.argv) < 2:
 		tests = 'all'
 	else:
@@ -551,6 +1860,48 @@ if __name__ == "__main__":
 		suite = loader.loadTestsFromTestCase(PewAccountTests)
 	if tests == '3p':
 		suite = loader.loadTestsFromTestCase(Pew3rdPartyTests)
+	if tests == 'export':
+		suite = loader.loadTestsFromTestCase(PewExportTests)
+	if tests == 'cache':
+		suite = loader.loadTestsFromTestCase(PewCacheTests)
+	if tests == 'pool':
+		suite = loader.loadTestsFromTestCase(PewParsePoolTests)
+	if tests == 'stream':
+		suite = loader.loadTestsFromTestCase(PewStreamParseTests)
+	if tests == 'compression':
+		suite = loader.loadTestsFromTestCase(PewCompressionTests)
+	if tests == 'market':
+		suite = loader.loadTestsFromTestCase(PewMarketTests)
+	if tests == 'mapstore':
+		suite = loader.loadTestsFromTestCase(PewMapStoreTests)
+	if tests == 'static':
+		suite = loader.loadTestsFromTestCase(PewStaticDataTests)
+	if tests == 'mail':
+		suite = loader.loadTestsFromTestCase(PewMailSyncTests)
+	if tests == 'contracts':
+		suite = loader.loadTestsFromTestCase(PewContractTests)
+	if tests == 'planets':
+		suite = loader.loadTestsFromTestCase(PewPlanetTests)
+	if tests == 'keys':
+		suite = loader.loadTestsFromTestCase(PewKeyPoolTests)
+	if tests == 'errors':
+		suite = loader.loadTestsFromTestCase(PewErrorHandlingTests)
+	if tests == 'registry':
+		suite = loader.loadTestsFromTestCase(PewRegistryTests)
+	if tests == 'hedging':
+		suite = loader.loadTestsFromTestCase(PewHedgingTests)
+	if tests == 'kills':
+		suite = loader.loadTestsFromTestCase(PewKillStreamTests)
+	if tests == 'load':
+		suite = loader.loadTestsFromTestCase(PewLoadTests)
+	if tests == 'wallet':
+		suite = loader.loadTestsFromTestCase(PewWalletTests)
+	if tests == 'memory':
+		suite = loader.loadTestsFromTestCase(PewMemoryBudgetTests)
+	if tests == 'startup':
+		suite = loader.loadTestsFromTestCase(PewStartupTests)
+	if tests == 'offline':
+		suite = unittest.TestSuite([loader.loadTestsFromTestCase(case) for case in offline])
 	elif tests == 'all':
 		suite = unittest.TestSuite()
 
@@ -562,5 +1913,6 @@ if __name__ == "__main__":
 		suite.addTests(loader.loadTestsFromTestCase(PewMapsTests))
 		suite.addTests(loader.loadTestsFromTestCase(PewMiscTests))
 		suite.addTests(loader.loadTestsFromTestCase(Pew3rdPartyTests))
+		suite.addTests([loader.loadTestsFromTestCase(case) for case in offline])
 
 	runner.run(suite)
@@ -0,0 +1,373 @@
+#---------------------------------------------------------------------------------------
+#
+# pew_wallet - columnar wallet analytics for Pew (Python Eve Wrapper).
+#
+# PewJournal and PewTransactions turn wallet rowsets (PewApiObjects from
+# char_wallet_journal / corp_wallet_journal / *_wallet_transactions, or the dicts
+# yielded by iter_rows) into one array per column once, then answer report questions
+# with whole-column operations: ISK flow per refTypeID, daily and rolling daily
+# totals, broker fee / tax totals and FIFO profit per typeID. refTypeIDs are joined
+# to their eve_reference_types names with ref_type_names().
+#
+# Usage:
+#
+#	journal = PewJournal(pew.iter_rows('char_wallet_journal', character_id))
+#	names = ref_type_names(pew)
+#	for name, amount in journal.named(journal.totals_by('refTypeID'), names).items():
+#		print name, amount
+#	days, totals = journal.rolling_daily(7)
+#
+#	transactions = PewTransactions(pew.char_wallet_transactions(character_id).transactions)
+#	transactions.fifo_profit()                  # typeID -> ISK
+#
+# Columns are NumPy arrays when NumPy is installed; otherwise the same methods run on
+# plain Python lists (correct, but meant for small histories).
+#
+#---------------------------------------------------------------------------------------
+
+import time
+import calendar
+from collections import deque
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+BROKER_FEE = 46
+TRANSACTION_TAX = 54
+
+DAY = 86400
+
+def _value(row, name):
+
+	return row.get(name) if isinstance(row, dict) else getattr(row, name, None)
+
+class _EpochParser(object):
+	"""API timestamps to epoch seconds, parsing each distinct day only once"""
+
+	def __init__(self):
+
+		self._days = {}
+
+	def __call__(self, text):
+
+		day = self._days.get(text[:10])
+
+		if day is None:
+			day = self._days[text[:10]] = calendar.timegm(time.strptime(text[:10], '%Y-%m-%d'))
+
+		return day + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+
+def ref_type_names(source):
+	"""refTypeID -> refTypeName from a Pew object, a PewStaticData or a ready dict"""
+
+	if isinstance(source, dict):
+		return source
+
+	if hasattr(source, 'ref_type_name'):
+		return source.index('ref_types', 'names')
+
+	return dict((row.refTypeID, row.refTypeName) for row in source.eve_reference_types().refTypes)
+
+class PewWalletColumns(object):
+	"""pew wallet columns - a wallet rowset stored as one array per column"""
+
+	# column -> (type, attribute in the rowset)
+	COLUMNS = {}
+
+	def __init__(self, rows = None, columns = None):
+
+		if columns is None:
+			columns = self._columns_from_rows(rows or [])
+
+		self.columns = dict((name, self._array(values, self.COLUMNS[name][0])) for name, values in columns.items())
+
+	def __len__(self):
+
+		return len(self.columns['date'])
+
+	def __getitem__(self, name):
+
+		return self.columns[name]
+
+	def named(self, totals, names):
+		"""Replaces the keys of a totals dict with their names where known"""
+
+		return dict((names.get(key, key), value) for key, value in totals.items())
+
+	def _columns_from_rows(self, rows):
+
+		parse_date = _EpochParser()
+		columns = dict((name, []) for name in self.COLUMNS)
+		converters = [(name, attribute, parse_date if kind == 'date' else (float if kind == 'float' else int)) for name, (kind, attribute) in self.COLUMNS.items()]
+
+		for row in rows:
+			for name, attribute, convert in converters:
+				columns[name].append(convert(self._raw(row, attribute)))
+
+		return columns
+
+	def _raw(self, row, attribute):
+
+		return _value(row, attribute)
+
+	def _array(self, values, kind):
+
+		if numpy is None:
+			return list(values)
+
+		return numpy.asarray(values, dtype=numpy.float64 if kind == 'float' else numpy.int64)
+
+	def _group_sum(self, keys, values):
+
+		if numpy is None:
+			totals = {}
+
+			for key, value in zip(keys, values):
+				totals[key] = totals.get(key, 0) + value
+
+			return totals
+
+		if len(keys) == 0:
+			return {}
+
+		unique, inverse = numpy.unique(keys, return_inverse=True)
+		sums = numpy.bincount(inverse, weights=values)
+
+		return dict(zip(unique.tolist(), sums.tolist()))
+
+	def _daily(self, values, mask = None):
+
+		days = self.columns['date']
+		days = [day // DAY for day in days] if numpy is None else days // DAY
+
+		if mask is not None:
+			days = [day for day, keep in zip(days, mask) if keep] if numpy is None else days[mask]
+			values = [value for value, keep in zip(values, mask) if keep] if numpy is None else values[mask]
+
+		if len(days) == 0:
+			return [], []
+
+		if numpy is None:
+			first = min(days)
+			totals = [0.0] * (max(days) - first + 1)
+
+			for day, value in zip(days, values):
+				totals[day - first] += value
+
+			return [(first + i) * DAY for i in range(len(totals))], totals
+
+		first = days.min()
+		totals = numpy.bincount(days - first, weights=values)
+
+		return (numpy.arange(len(totals)) + first) * DAY, totals
+
+class PewJournal(PewWalletColumns):
+	"""pew journal - wallet journal columns with ISK flow reports"""
+
+	COLUMNS = {
+		'date': ('date', 'date'),
+		'refID': ('int', 'refID'),
+		'refTypeID': ('int', 'refTypeID'),
+		'ownerID1': ('int', 'ownerID1'),
+		'ownerID2': ('int', 'ownerID2'),
+		'amount': ('float', 'amount'),
+		'taxAmount': ('float', 'taxAmount'),
+	}
+
+	def _raw(self, row, attribute):
+
+		value = _value(row, attribute)
+
+		# taxAmount / owner IDs are empty or missing on many journal rows
+		return 0 if value in (None, '') else value
+
+	def totals_by(self, column = 'refTypeID', positive = None):
+		"""Summed amount per value of a column
+		INPUT: column name, positive True / False for income / spending only, None for both
+		OUTPUT: dict of column value -> ISK"""
+
+		keys, amounts = self.columns[column], self.columns['amount']
+
+		if positive is not None:
+			mask = self._sign_mask(positive)
+			keys = [k for k, keep in zip(keys, mask) if keep] if numpy is None else keys[mask]
+			amounts = [a for a, keep in zip(amounts, mask) if keep] if numpy is None else amounts[mask]
+
+		return self._group_sum(keys, amounts)
+
+	def daily(self, ref_type_ids = None):
+		"""ISK flow per UTC day, days without entries included as 0
+		OUTPUT: (day start epoch seconds, totals) as two equal length columns"""
+
+		return self._daily(self.columns['amount'], self._ref_type_mask(ref_type_ids))
+
+	def rolling_daily(self, window = 7, ref_type_ids = None):
+		"""Trailing `window` day sums of daily(), one per day"""
+
+		days, totals = self.daily(ref_type_ids)
+
+		if numpy is None:
+			running, rolling = 0.0, []
+
+			for i, total in enumerate(totals):
+				running += total - (totals[i - window] if i >= window else 0)
+				rolling.append(running)
+
+			return days, rolling
+
+		sums = numpy.cumsum(totals)
+		sums[window:] = sums[window:] - sums[:-window].copy()
+
+		return days, sums
+
+	def fees(self):
+		"""Broker fees and transaction taxes paid (as positive ISK)"""
+
+		totals = self.totals_by('refTypeID')
+
+		return {'broker_fees': -totals.get(BROKER_FEE, 0.0), 'transaction_tax': -totals.get(TRANSACTION_TAX, 0.0)}
+
+	def _sign_mask(self, positive):
+
+		amounts = self.columns['amount']
+
+		if numpy is None:
+			return [(amount > 0) == positive for amount in amounts]
+
+		return amounts > 0 if positive else amounts <= 0
+
+	def _ref_type_mask(self, ref_type_ids):
+
+		if ref_type_ids is None:
+			return None
+
+		if numpy is None:
+			wanted = set(ref_type_ids)
+			return [ref_type_id in wanted for ref_type_id in self.columns['refTypeID']]
+
+		return numpy.in1d(self.columns['refTypeID'], list(ref_type_ids))
+
+class PewTransactions(PewWalletColumns):
+	"""pew transactions - market transaction columns with FIFO profit matching"""
+
+	COLUMNS = {
+		'date': ('date', 'transactionDateTime'),
+		'transactionID': ('int', 'transactionID'),
+		'typeID': ('int', 'typeID'),
+		'quantity': ('int', 'quantity'),
+		'price': ('float', 'price'),
+		'buy': ('int', 'transactionType'),
+	}
+
+	def _raw(self, row, attribute):
+
+		value = _value(row, attribute)
+
+		return int(value == 'buy') if attribute == 'transactionType' else value
+
+	def totals_by(self, column = 'typeID', buy = None):
+		"""ISK value (price * quantity) per value of a column, optionally only buys or sells"""
+
+		keys = self.columns[column]
+		values = [p * q for p, q in zip(self.columns['price'], self.columns['quantity'])] if numpy is None else self.columns['price'] * self.columns['quantity']
+
+		if buy is not None:
+			mask = [b == int(buy) for b in self.columns['buy']] if numpy is None else self.columns['buy'] == int(buy)
+			keys = [k for k, keep in zip(keys, mask) if keep] if numpy is None else keys[mask]
+			values = [v for v, keep in zip(values, mask) if keep] if numpy is None else values[mask]
+
+		return self._group_sum(keys, values)
+
+	def daily(self, buy = None):
+
+		values = [p * q for p, q in zip(self.columns['price'], self.columns['quantity'])] if numpy is None else self.columns['price'] * self.columns['quantity']
+		mask = None
+
+		if buy is not None:
+			mask = [b == int(buy) for b in self.columns['buy']] if numpy is None else self.columns['buy'] == int(buy)
+
+		return self._daily(values, mask)
+
+	def fifo_profit(self):
+		"""Realized profit per typeID, matching each sale against the oldest earlier purchases
+		OUTPUT: dict of typeID -> {'profit', 'matched', 'unmatched'}, unmatched being units sold with no purchase in the history"""
+
+		if numpy is None:
+			return self._fifo_profit_python()
+
+		order = numpy.lexsort((self.columns['transactionID'], self.columns['date'], self.columns['typeID']))
+		type_ids = self.columns['typeID'][order]
+		results = {}
+
+		if len(order) == 0:
+			return results
+
+		bounds = numpy.flatnonzero(numpy.diff(type_ids)) + 1
+
+		for indexes in numpy.split(order, bounds):
+			results[int(self.columns['typeID'][indexes[0]])] = self._fifo_type(self.columns['quantity'][indexes].astype(numpy.float64), self.columns['price'][indexes], self.columns['buy'][indexes] == 1)
+
+		return results
+
+	def _fifo_type(self, quantity, price, is_buy):
+		"""FIFO matching of one type's time ordered transactions, without a per-unit queue.
+
+		With B = units bought so far and S = units sold so far, the units matched after
+		each sale are M = S + min(0, running min of (B - S)): a sale can only consume
+		purchases made before it. A sale's cost is C(M) - C(M before it), where C(q) is
+		the cost of the first q units bought, a piecewise linear function of q."""
+
+		bought = numpy.cumsum(numpy.where(is_buy, quantity, 0))
+		sold = numpy.cumsum(numpy.where(is_buy, 0, quantity))
+		sales = ~is_buy
+
+		if not sales.any():
+			return {'profit': 0.0, 'matched': 0, 'unmatched': 0}
+
+		matched = sold[sales] + numpy.minimum(numpy.minimum.accumulate((bought - sold)[sales]), 0)
+		buy_quantity, buy_price = quantity[is_buy], price[is_buy]
+
+		if len(buy_quantity) > 0:
+			units = numpy.concatenate(([0], numpy.cumsum(buy_quantity)))
+			costs = numpy.concatenate(([0], numpy.cumsum(buy_quantity * buy_price)))
+			i = numpy.clip(numpy.searchsorted(units, matched, 'right') - 1, 0, len(buy_quantity) - 1)
+			cost = costs[i] + (matched - units[i]) * buy_price[i]
+		else:
+			cost = numpy.zeros(len(matched))
+
+		matched_per_sale = numpy.diff(numpy.concatenate(([0], matched)))
+		cost_per_sale = numpy.diff(numpy.concatenate(([0], cost)))
+		profit = (matched_per_sale * price[sales]).sum() - cost_per_sale.sum()
+
+		return {'profit': float(profit), 'matched': int(matched[-1]), 'unmatched': int(sold[-1] - matched[-1])}
+
+	def _fifo_profit_python(self):
+
+		rows = sorted(zip(self.columns['typeID'], self.columns['date'], self.columns['transactionID'], self.columns['quantity'], self.columns['price'], self.columns['buy']))
+		results = {}
+		lots = {}
+
+		for type_id, date, transaction_id, quantity, price, buy in rows:
+			result = results.setdefault(type_id, {'profit': 0.0, 'matched': 0, 'unmatched': 0})
+			queue = lots.setdefault(type_id, deque())
+
+			if buy:
+				queue.append([quantity, price])
+				continue
+
+			while quantity > 0 and len(queue) > 0:
+				lot = queue[0]
+				used = min(quantity, lot[0])
+				result['profit'] += used * (price - lot[1])
+				result['matched'] += used
+				quantity -= used
+				lot[0] -= used
+
+				if lot[0] == 0:
+					queue.popleft()
+
+			result['unmatched'] += quantity
+
+		return results